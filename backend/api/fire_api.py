@@ -1,11 +1,30 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from services.fire_service import run_fire_model
+import asyncio
+import json
+import time
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, model_validator
+from datetime import date
+from typing import Any, Awaitable, Callable, List, Literal, Optional
+from services.fire_service import (
+    run_fire_model,
+    run_fire_scenarios,
+    run_firebreak_optimization,
+)
+from services.executor_service import SIM_TASK_TIMEOUT_S, run_in_process
+from services.job_service import DONE, FAILED, get_job, submit_simulation
+from services.ensemble_service import run_ensemble
+from services.environment_service import cache_stats
+from services.session_service import create_session, fork_session, get_session, step_session
+from services.wind_service import prefetch_wind
 
 # app = FastAPI(title="Fire Simulation API")
 
 router = APIRouter(prefix="/fire", tags=["Fire Simulation"])
 
+# ค่าเดียวกับ raster_service.RASTER_ENCODINGS
+RasterEncoding = Literal["png", "zlib", "rle"]
+
 
 class FireRequest(BaseModel):
     lat: float
@@ -17,8 +36,335 @@ class FireRequest(BaseModel):
     grid_y: int = 100
     cell_size: int = 20
     sim_minutes: int = 15
+    engine: Literal["sweep", "event", "auto"] = "auto"  # auto: ดู resolved_engine (numba หรือเซลล์ ≤ 5 m → sweep)
+    kernel: Optional[Literal["python", "numba", "auto"]] = None  # None → SIM_KERNEL
+    hourly_wind: bool = False  # True → ลมเปลี่ยนทุกชั่วโมงตาม archive (False → ลมคงที่ตลอดการจำลอง)
+    ignition_row: Optional[int] = None  # จุดตั้งต้น (แถว, คอลัมน์) ; None → กลางกริด
+    ignition_col: Optional[int] = None
+    firebreak_width_m: float = 8.0
+    firebreak_shape: Literal["square", "round"] = "square"
+    compact: Optional[bool] = None  # uint8/float32 grids ; None → อัตโนมัติตามขนาดกริด
+
+    @model_validator(mode="after")
+    def _ignition_in_grid(self):
+        _check_ignition(self.ignition_row, self.ignition_col, self.grid_y, self.grid_x)
+        return self
+
+
+def _check_ignition(
+    row: Optional[int], col: Optional[int], grid_y: int, grid_x: int, where: str = ""
+) -> None:
+    """จุดตั้งต้นนอกกริด → ValueError (pydantic แปลงเป็น 422) แทนการรันแล้วไม่มีอะไรไหม้"""
+    if row is not None and not 0 <= row < grid_y:
+        raise ValueError(f"{where}ignition_row must be in [0, {grid_y - 1}]")
+    if col is not None and not 0 <= col < grid_x:
+        raise ValueError(f"{where}ignition_col must be in [0, {grid_x - 1}]")
+
+
+def _with_raster(
+    req: FireRequest, raster: Optional[RasterEncoding], isochrones: Optional[str]
+) -> dict:
+    """
+    cfg + รูปแบบ raster ที่ frontend ขอผ่าน query (?raster=png&isochrones=30,60)
+    isochrones อยู่ในผล raster → ขอ isochrones โดยไม่ระบุ raster ใช้ png
+    """
+    cfg = req.dict()
+    if raster is None and not isochrones:
+        return cfg
+    try:
+        minutes = [float(m) for m in isochrones.split(",") if m.strip()] if isochrones else []
+    except ValueError:
+        raise HTTPException(status_code=400, detail="isochrones must be comma-separated minutes")
+    if len(minutes) > 24:
+        raise HTTPException(status_code=400, detail="At most 24 isochrones")
+    cfg["raster"], cfg["isochrones_min"] = raster or "png", minutes
+    return cfg
+
+
+async def _run_with_deadline(run: Callable[[float], Awaitable[Any]]) -> Any:
+    """await run(deadline) โดย deadline = ตอนนี้ + SIM_TASK_TIMEOUT_S ; หมดเวลา → 504"""
+    deadline = time.time() + SIM_TASK_TIMEOUT_S
+    try:
+        return await run(deadline)
+    except (asyncio.TimeoutError, TimeoutError):
+        raise HTTPException(status_code=504, detail="Simulation timed out")
 
 
 @router.post("/fire/simulate")
-def simulate(req: FireRequest):
-    return run_fire_model(req.dict())
+async def simulate(
+    req: FireRequest,
+    raster: Optional[RasterEncoding] = Query(None, description="แนบ raster เวลาไฟมาถึง"),
+    isochrones: Optional[str] = Query(
+        None, description="นาทีคั่นด้วย comma เช่น 30,60,120 (ไม่ระบุ raster → png)"
+    ),
+):
+    # รันใน process pool → simulation หลายงานใช้หลายคอร์ได้จริง ไม่แย่ง GIL กับ API
+    cfg = _with_raster(req, raster, isochrones)
+    return await _run_with_deadline(
+        lambda deadline: run_in_process(run_fire_model, cfg, None, deadline)
+    )
+
+
+class WhatIfScenario(BaseModel):
+    ignition_row: Optional[int] = None
+    ignition_col: Optional[int] = None
+    sim_minutes: Optional[int] = None
+    firebreak_width_m: Optional[float] = None
+    wind_speed: Optional[float] = None  # ระบุลม → ลมคงที่ตลอด scenario
+    wind_dir: Optional[float] = None
+
+
+class WhatIfRequest(FireRequest):
+    scenarios: List[WhatIfScenario] = Field(..., min_length=1, max_length=50)
+
+    @model_validator(mode="after")
+    def _scenario_ignition_in_grid(self):
+        for k, sc in enumerate(self.scenarios):
+            _check_ignition(
+                sc.ignition_row, sc.ignition_col, self.grid_y, self.grid_x, f"scenarios[{k}]."
+            )
+        return self
+
+
+@router.post("/fire/whatif")
+async def simulate_whatif(req: WhatIfRequest):
+    # โหลด environment ครั้งเดียว แล้ว reset + รันทุก scenario บน simulator ตัวเดิม
+    cfg = req.dict(exclude={"scenarios"})
+    scenarios = [sc.dict() for sc in req.scenarios]
+    return await _run_with_deadline(
+        lambda deadline: run_in_process(run_fire_scenarios, cfg, scenarios, deadline)
+    )
+
+
+class FirebreakLayout(BaseModel):
+    distance_m: float = Field(0.0, ge=0)  # ห่างจากแนวไฟ ณ checkpoint
+    width_m: float = Field(8.0, gt=0)
+    arc_deg: float = Field(360.0, gt=0, le=360)  # < 360 → เฉพาะส่วนโค้งด้านใต้ลม
+
+
+class FirebreakOptimizeRequest(FireRequest):
+    checkpoint_minutes: float = Field(10.0, ge=0)  # เวลาที่เริ่มทำแนวกันไฟ
+    layouts: Optional[List[FirebreakLayout]] = Field(None, min_length=1, max_length=64)
+    # ไม่ระบุ layouts → ทุกคู่ของ distances_m × widths_m × arcs_deg
+    distances_m: List[float] = [0.0, 20.0, 40.0]
+    widths_m: List[float] = [8.0, 16.0]
+    arcs_deg: List[float] = [360.0, 180.0]
+
+
+@router.post("/fire/firebreak/optimize")
+async def optimize_firebreak(req: FirebreakOptimizeRequest):
+    # รันถึง checkpoint ครั้งเดียว แล้ว fork ต่อ layout → เลือกแนวที่กักไฟได้คุ้มสุดต่อเมตร
+    if req.layouts is not None:
+        layouts = [layout.dict() for layout in req.layouts]
+    else:
+        layouts = [
+            {"distance_m": d, "width_m": w, "arc_deg": a}
+            for d in req.distances_m
+            for w in req.widths_m
+            for a in req.arcs_deg
+        ]
+    if not layouts or len(layouts) > 64:
+        raise HTTPException(status_code=400, detail="Provide between 1 and 64 layouts")
+
+    cfg = req.dict(exclude={"layouts", "distances_m", "widths_m", "arcs_deg"})
+    return await _run_with_deadline(
+        lambda deadline: run_in_process(
+            run_firebreak_optimization, cfg, layouts, req.checkpoint_minutes, deadline
+        )
+    )
+
+
+class EnsembleRequest(FireRequest):
+    n_members: int = Field(20, ge=1, le=200)
+    seed: Optional[int] = None
+    dir_spread_deg: float = 15.0  # sd ของทิศลม (องศา)
+    ndvi_sigma: float = 0.0  # sd ของ NDVI perturbation
+    lst_sigma: float = 0.0  # sd ของ LST perturbation (°C)
+    raster: RasterEncoding = "png"  # รูปแบบกริดในผลลัพธ์
+
+
+@router.post("/fire/ensemble")
+async def simulate_ensemble(req: EnsembleRequest):
+    # member กระจายไป process pool ; เกิน SIM_TASK_TIMEOUT_S → 504
+    return await _run_with_deadline(
+        lambda deadline: run_ensemble(
+            req.dict(),
+            n_members=req.n_members,
+            seed=req.seed,
+            dir_spread_deg=req.dir_spread_deg,
+            ndvi_sigma=req.ndvi_sigma,
+            lst_sigma=req.lst_sigma,
+            deadline=deadline,
+            encoding=req.raster,
+        )
+    )
+
+
+class WindPoint(BaseModel):
+    lat: float
+    lon: float
+
+
+class WindPrefetchRequest(BaseModel):
+    points: List[WindPoint] = Field(..., min_length=1, max_length=500)
+    start_date: date
+    end_date: date
+
+
+@router.post("/wind/prefetch")
+def wind_prefetch(req: WindPrefetchRequest):
+    """ดึงลมรายชั่วโมงของหลายพิกัดตลอดช่วงวันล่วงหน้า (เติม wind cache ให้ batch scenario)"""
+    if (req.end_date - req.start_date).days > 366:
+        raise HTTPException(status_code=400, detail="Date range is limited to 366 days")
+    try:
+        return prefetch_wind(
+            [(p.lat, p.lon) for p in req.points],
+            req.start_date.isoformat(),
+            req.end_date.isoformat(),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """
+    hit / miss ของ env cache, patch cache และ tile cache ของ process API
+    (worker ใน process pool มี cache ของตัวเอง → พิมพ์ลง log ทุก CACHE_STATS_LOG_S)
+    """
+    return cache_stats()
+
+
+# =========================
+# ⏯ Sessions (เดินทีละช่วง / แตกกิ่ง what-if จาก snapshot)
+# =========================
+class SessionStepRequest(BaseModel):
+    minutes: float = Field(15.0, gt=0, le=24 * 60)
+
+
+class SessionForkRequest(BaseModel):
+    wind_speed: Optional[float] = None  # ระบุลม → กิ่งใหม่ใช้ลมคงที่ตั้งแต่จุดแตกกิ่ง
+    wind_dir: Optional[float] = None
+
+
+def _get_session_or_404(session_id: str):
+    session = get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return session
+
+
+@router.post("/fire/sessions", status_code=201)
+async def create_simulation_session(req: FireRequest):
+    # session คิด deadline เองต่อ step (ไม่นับเวลารอ lock)
+    return (await _run_with_deadline(lambda _: create_session(req.dict()))).to_dict()
+
+
+@router.get("/fire/sessions/{session_id}")
+async def get_simulation_session(session_id: str):
+    return _get_session_or_404(session_id).to_dict()
+
+
+@router.post("/fire/sessions/{session_id}/step")
+async def step_simulation_session(session_id: str, req: SessionStepRequest):
+    session = _get_session_or_404(session_id)
+    return (await _run_with_deadline(lambda _: step_session(session, req.minutes))).to_dict()
+
+
+@router.post("/fire/sessions/{session_id}/fork", status_code=201)
+async def fork_simulation_session(session_id: str, req: SessionForkRequest):
+    session = _get_session_or_404(session_id)
+    return (await fork_session(session, req.wind_speed, req.wind_dir)).to_dict()
+
+
+# =========================
+# ⏳ Async jobs (simulation ยาว / กริดใหญ่)
+# =========================
+def _get_job_or_404(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.post("/fire/jobs", status_code=202)
+def submit_simulation_job(
+    req: FireRequest,
+    raster: Optional[RasterEncoding] = Query(None, description="แนบ raster เวลาไฟมาถึง"),
+    isochrones: Optional[str] = Query(
+        None, description="นาทีคั่นด้วย comma เช่น 30,60,120 (ไม่ระบุ raster → png)"
+    ),
+    front_every_s: Optional[float] = Query(
+        None, gt=0, description="stream แนวไฟทุก N วินาทีจำลอง ทาง /fire/jobs/{id}/front"
+    ),
+):
+    cfg = _with_raster(req, raster, isochrones)
+    cfg["front_every_s"] = front_every_s
+    job = submit_simulation(cfg, stream_front=front_every_s is not None)
+    return job.to_dict()
+
+
+@router.get("/fire/jobs/{job_id}")
+def get_simulation_job(job_id: str):
+    return _get_job_or_404(job_id).to_dict(include_result=True)
+
+
+@router.get("/fire/jobs/{job_id}/result")
+def get_simulation_job_result(job_id: str):
+    job = _get_job_or_404(job_id)
+    if job.status == FAILED:
+        raise HTTPException(status_code=500, detail=f"Simulation failed: {job.error}")
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job.result
+
+
+@router.get("/fire/jobs/{job_id}/events")
+async def stream_simulation_job(job_id: str, interval: float = 0.5):
+    """Server-Sent Events: ส่ง progress ทุก interval วินาที และส่งผลลัพธ์เมื่อจบ"""
+    job = _get_job_or_404(job_id)
+    interval = min(max(interval, 0.1), 10.0)
+
+    async def events():
+        last = None
+        while True:
+            payload = job.to_dict(include_result=True)
+            if payload != last:
+                yield f"event: {job.status}\ndata: {json.dumps(payload)}\n\n"
+                last = payload
+            if job.status in (DONE, FAILED):
+                break
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.get("/fire/jobs/{job_id}/front")
+async def stream_simulation_front(job_id: str, since: int = 0, interval: float = 0.2):
+    """
+    Server-Sent Events: delta ของแนวไฟระหว่างรัน (ต้อง submit ด้วย ?front_every_s=...)
+    - event "front": {"seq", "t_s", "ignited", "ignited_t_s", "burned"} เป็น flat index
+      (i * grid_x + j) → ขนาดตามแนวไฟ ไม่ใช่ทั้งกริด
+    - since: seq แรกที่ต้องการ (ต่อ stream เดิมหลังหลุด) ; จบด้วย event done / failed
+    """
+    job = _get_job_or_404(job_id)
+    if job.front is None:
+        raise HTTPException(status_code=409, detail="Job was not submitted with front_every_s")
+    interval = min(max(interval, 0.05), 10.0)
+
+    async def events():
+        sent = max(0, since)
+        grid = {"grid_x": job.cfg["grid_x"], "grid_y": job.cfg["grid_y"]}
+        yield f"event: start\ndata: {json.dumps(grid)}\n\n"
+        while True:
+            finished = job.status in (DONE, FAILED)  # อ่านก่อน frame → ไม่พลาด frame สุดท้าย
+            n = len(job.front)
+            for frame in job.front[sent:n]:
+                yield f"id: {frame['seq']}\nevent: front\ndata: {json.dumps(frame)}\n\n"
+            sent = max(sent, n)
+            if finished:
+                yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+                break
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -1,7 +1,10 @@
+import asyncio
+import time
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict
 from services.math_service import optimize_from_frontend
+from services.executor_service import SIM_TASK_TIMEOUT_S, run_in_process
 
 router = APIRouter(prefix="/math", tags=["Math Optimization"])
 
@@ -12,12 +15,15 @@ class OptimizeRequest(BaseModel):
 
 
 @router.post("/optimize")
-def optimize_firebreak(payload: OptimizeRequest):
+async def optimize_firebreak(payload: OptimizeRequest):
     """
-    รับ zones จาก frontend โดยตรง
+    รับ zones จาก frontend โดยตรง (solve ใน process pool ; solver หยุดเองเมื่อครบ SIM_TASK_TIMEOUT_S)
     """
+    deadline = time.time() + SIM_TASK_TIMEOUT_S
     try:
-        result = optimize_from_frontend(payload.zones, payload.centers)
+        result = await run_in_process(
+            optimize_from_frontend, payload.zones, payload.centers, deadline
+        )
         return {
             "status": "success",
             "result": result,
@@ -26,5 +32,8 @@ def optimize_firebreak(payload: OptimizeRequest):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    except (asyncio.TimeoutError, TimeoutError):
+        raise HTTPException(status_code=504, detail="Optimization timed out")
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Optimization failed: {e}")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compiled kernel (Numba) ของ CA step ใน fire_simulator — backend เสริม (optional)
+
+- A2: ประเมินเวลาจุดติดของเซลล์ UNBURNED (ตรรกะเดียวกับ _evaluate_ignition)
+  ทั้งแนวไฟของ sweep และ dirty set ของ event ผ่าน kernel เดียวกัน
+- kernel เขียน ignition_time ในที่ และคืนรายการ push ตามลำดับเซลล์ที่ส่งมา
+  → ฝั่ง Python heappush ตามลำดับเดิม คิวจึงเหมือน path Python ทุก bit
+- Python path ยังเป็น reference เสมอ: kernel="python" (ค่าเริ่มต้น) | "numba" | "auto"
+- ไม่มี numba → "auto" ถอยไปใช้ Python, "numba" → ImportError
+- ไม่ใช้ fastmath เพื่อให้ลำดับการคำนวณ floating point ตรงกับ Python
+
+ตรวจ parity + วัดความเร็วบนกริดสังเคราะห์:  python fire_kernels.py
+"""
+
+from typing import Any, Dict
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # optional dependency
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+KERNELS = ("python", "numba", "auto")
+
+# ต้องตรงกับ fire_simulator (ไม่ import ข้ามกันเพื่อให้โมดูลนี้ compile ได้ลำพัง)
+_UNBURNED, _BURNING = 0, 1
+
+if NUMBA_AVAILABLE:
+    # compile ตอนเรียกครั้งแรก; cache=True → process ถัดไป (เช่น worker ของ pool) โหลดจาก __pycache__
+    _jit = numba.njit(cache=True, nogil=True)
+else:
+    def _jit(fn):
+        return fn
+
+
+def resolve_kernel(kernel: str) -> str:
+    """ชื่อ kernel ที่จะใช้จริง ("auto" → numba ถ้ามี)"""
+    if kernel not in KERNELS:
+        raise ValueError(f"Unknown kernel '{kernel}', expected one of {KERNELS}")
+    if kernel == "auto":
+        return "numba" if NUMBA_AVAILABLE else "python"
+    if kernel == "numba" and not NUMBA_AVAILABLE:
+        raise ImportError("kernel='numba' requires the numba package")
+    return kernel
+
+
+# ===== Kernels =====
+@_jit
+def _evaluate_cell(
+    i, j, state, ros_grid, ignition_time, table, min_neighbors, single_penalty,
+    t_floor, compact, has_origin, origin_slot, spread_origin,
+):
+    """คืน (push?, best_t, best_dur) ของเซลล์ (i,j) — สำเนาของ _evaluate_ignition"""
+    grid_y, grid_x = state.shape
+    burning_neighbors = 0
+    best_t, best_dur = np.inf, np.inf
+
+    for r in range(table.shape[0]):
+        ny, nx = i + int(table[r, 0]), j + int(table[r, 1])
+        if not (0 <= ny < grid_y and 0 <= nx < grid_x):
+            continue
+        if state[ny, nx] != _BURNING:
+            continue
+        ros_eff = np.float64(ros_grid[ny, nx]) * table[r, 2]
+        if not ros_eff > 0:  # รวม NaN
+            continue
+
+        delay = table[r, 3] / ros_eff
+        slot = origin_slot[ny, nx] if has_origin else -1
+        if slot >= 0:  # ไหม้อยู่ก่อนลมเปลี่ยน
+            ignite_t = spread_origin[slot, int(table[r, 4])] + delay
+        else:
+            ignite_t = np.float64(ignition_time[ny, nx]) + delay
+        if ignite_t < np.inf:
+            burning_neighbors += 1
+            if ignite_t < best_t:
+                best_t, best_dur = ignite_t, delay
+
+    if burning_neighbors < min_neighbors or not best_t < np.inf:
+        return False, best_t, best_dur
+
+    if burning_neighbors == 1:
+        best_dur *= 1.0 + single_penalty
+        best_t += single_penalty * best_dur
+    if burning_neighbors >= 2:
+        best_dur *= 0.97
+        best_t -= 0.03 * best_dur
+    if best_t < t_floor:
+        best_t = t_floor
+
+    cutoff = best_t + 1e-9
+    if compact:  # float32 → float64 แปลงกลับได้ตรง → ผลเทียบเท่ากับเทียบที่ float32
+        cutoff = np.float64(np.float32(cutoff))
+    if cutoff < np.float64(ignition_time[i, j]):
+        ignition_time[i, j] = best_t
+        return True, best_t, best_dur
+    return False, best_t, best_dur
+
+
+@_jit
+def _evaluate_cells(
+    cells_i, cells_j, state, ros_grid, ignition_time, table, min_neighbors,
+    single_penalty, t_floor, compact, has_origin, origin_slot, spread_origin,
+    out_t, out_i, out_j, out_dur,
+):
+    """A2: เฉพาะเซลล์ที่ระบุ (ลำดับตามที่ส่งมา) → จำนวน push"""
+    n = 0
+    for k in range(cells_i.shape[0]):
+        i, j = cells_i[k], cells_j[k]
+        if state[i, j] != _UNBURNED:
+            continue
+        push, best_t, best_dur = _evaluate_cell(
+            i, j, state, ros_grid, ignition_time, table, min_neighbors,
+            single_penalty, t_floor, compact, has_origin, origin_slot, spread_origin,
+        )
+        if push:
+            out_t[n], out_i[n], out_j[n], out_dur[n] = best_t, i, j, best_dur
+            n += 1
+    return n
+
+
+def get_kernels() -> Dict[str, Any]:
+    """kernel ที่ compile แล้ว (ต้องมี numba)"""
+    if not NUMBA_AVAILABLE:
+        raise ImportError("kernel='numba' requires the numba package")
+    return {
+        "evaluate_cells": _evaluate_cells,
+    }
+
+
+# ===== Parity check (กริดสังเคราะห์คงที่) =====
+def _synthetic_env(grid_y: int, grid_x: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:grid_y, 0:grid_x]
+    slope = np.tan(np.radians(np.clip(12 + 8 * np.sin(yy / 9.0) + rng.normal(0, 3, yy.shape), 0, 40)))
+    ndvi = np.clip(0.45 + 0.2 * np.cos(xx / 11.0) + rng.normal(0, 0.08, yy.shape), -0.1, 0.9)
+    lst = 33 + 4 * np.sin((xx + yy) / 17.0) + rng.normal(0, 1, yy.shape)
+    landcover = rng.choice(np.array([0, 1, 2, 3], dtype=np.uint8), size=yy.shape, p=[0.1, 0.4, 0.3, 0.2])
+    return slope, ndvi, lst, landcover
+
+
+def _run_once(kernel: str, engine: str, compact: bool, grid: int, minutes: int, schedule):
+    from fire_simulator import IntegratedRothermelFireSimulator
+
+    env = _synthetic_env(grid, grid)
+    sim = IntegratedRothermelFireSimulator(
+        lat=18.74, lon=98.84, month=3, wind_speed=6.0, wind_dir=45.0,
+        grid_x=grid, grid_y=grid, cell_size=5.0, sim_minutes=minutes,
+        engine=engine, patch_provider=lambda *a, **k: env,
+        wind_schedule=schedule, compact=compact, kernel=kernel,
+    )
+    sim.run_simulation(show_progress=False)
+    return sim
+
+
+def check_parity(grid: int = 60, minutes: int = 60) -> bool:
+    """รัน python vs numba บนกริดเดียวกัน → state / ignition_time / คิว ต้องเท่ากันทุก bit"""
+    schedule = [(0, 4.0, 45.0), (1200, 7.0, 90.0), (2400, 2.5, 200.0)]
+    ok = True
+    for engine in ("sweep", "event"):
+        for compact in (False, True):
+            ref = _run_once("python", engine, compact, grid, minutes, schedule)
+            fast = _run_once("numba", engine, compact, grid, minutes, schedule)
+            same = (
+                np.array_equal(ref.state, fast.state)
+                and np.array_equal(ref.ignition_time, fast.ignition_time)
+                and ref.ignite_queue == fast.ignite_queue
+            )
+            ok &= same
+            print(
+                f"{'✅' if same else '❌'} engine={engine:5s} compact={compact!s:5s} "
+                f"python={ref.execution_time:.2f}s numba={fast.execution_time:.2f}s"
+            )
+    return ok
+
+
+if __name__ == "__main__":
+    for warm_engine in ("sweep", "event"):  # compile ทุก dtype ก่อนจับเวลา
+        for warm_compact in (False, True):
+            _run_once("numba", warm_engine, warm_compact, 10, 5, None)
+    raise SystemExit(0 if check_parity() else 1)
@@ -31,29 +31,48 @@ Fix หลัก:
 """
 
 import os
-import ee
 import numpy as np
 import time
 import sys
 import math
-import cv2
 import heapq
-from typing import List, Tuple, Dict, Any, Optional
+import copy
+import io
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Dict, Any, Optional, Callable, Sequence
 from dotenv import load_dotenv
-from google.oauth2 import service_account
 
-# ===== Initialize GEE =====
+# ===== Initialize GEE (lazy) =====
+# ee / google-auth / cv2 import เมื่อใช้จริงเท่านั้น → import โมดูลนี้ (และ start API) ไม่ต้องรอ GEE auth
 load_dotenv()
 
 PROJECT = os.getenv("GEE_PROJECT_ID")
 CREDENTIALS_PATH = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 
-credentials = service_account.Credentials.from_service_account_file(
-    CREDENTIALS_PATH,
-    scopes=["https://www.googleapis.com/auth/earthengine"]
-)
+_ee = None
+_ee_lock = threading.Lock()
+
+
+def init_gee():
+    """ee.Initialize ครั้งแรกที่ต้องใช้ (หรือจาก warm-up ตอน startup) แล้วคืนโมดูล ee"""
+    global _ee
+    if _ee is not None:
+        return _ee
+    with _ee_lock:
+        if _ee is None:
+            import ee
+            from google.oauth2 import service_account
 
-ee.Initialize(credentials, project=PROJECT)
+            credentials = service_account.Credentials.from_service_account_file(
+                CREDENTIALS_PATH,
+                scopes=["https://www.googleapis.com/auth/earthengine"]
+            )
+
+            ee.Initialize(credentials, project=PROJECT)
+            _ee = ee
+    return _ee
 
 
 # ===== Cell states =====
@@ -62,6 +81,34 @@ BURNING = 1
 BURNED = 2
 FIREBREAK = 3
 
+# ===== Spread engines =====
+# sweep: เดินทุกเซลล์ทุก dt (ต้นแบบเดิม)
+# event: ประมวลผลเฉพาะแนวไฟจาก ignite_queue ตามลำดับเวลา (Dijkstra-style)
+# auto: sweep เมื่อใช้ kernel numba (แนวไฟหนาแน่นเร็วกว่า ~1.5-3x)
+#       หรือเซลล์เล็ก ≤ AUTO_SWEEP_MAX_CELL_M (แนวไฟหนา หลายสิบเซลล์ต่อ step) ไม่งั้น event
+#       Python path วัดได้: 3 m → sweep เร็วกว่า ~1.4-2x, 5 m ≈ เท่ากัน,
+#       8-30 m → event เร็วกว่า 1.5-10x — ผลเหมือนกันทุกแบบ
+ENGINES = ("sweep", "event", "auto")
+AUTO_SWEEP_MAX_CELL_M = 5.0
+
+# ===== 8-neighbour stencil (เรียงแถวบน→ล่าง ซ้าย→ขวา) =====
+NEIGHBOR_OFFSETS = (
+    (-1, -1),
+    (-1, 0),
+    (-1, 1),
+    (0, -1),
+    (0, 1),
+    (1, -1),
+    (1, 0),
+    (1, 1),
+)
+_OFFSET_DIST = np.array([math.sqrt(2) if dy and dx else 1.0 for dy, dx in NEIGHBOR_OFFSETS])
+_OFFSET_DY = np.array([dy for dy, _ in NEIGHBOR_OFFSETS], dtype=np.int64)
+_OFFSET_DX = np.array([dx for _, dx in NEIGHBOR_OFFSETS], dtype=np.int64)
+# kernel ต้องได้ array ชนิดเดิมเสมอ → ตัวแทนเมื่อยังไม่มี _spread_origin
+_NO_ORIGIN_SLOT = np.full((1, 1), -1, dtype=np.int32)
+_NO_SPREAD_ORIGIN = np.zeros((1, len(NEIGHBOR_OFFSETS)))
+
 # ===== Fuel Model Mapping (Anderson 13 simplified) =====
 FUEL_MODELS = {
     1: {
@@ -85,6 +132,34 @@ FUEL_MODELS = {
 }
 
 
+# ===== Landcover classes (uint8 code ภายใน, ชื่อ string เฉพาะตอนรายงาน) =====
+LC_OTHER, LC_FOREST, LC_SHRUB, LC_SAVANNA = 0, 1, 2, 3
+LANDCOVER_CLASSES = ("other", "forest", "shrub", "savanna")  # index = code
+# class ที่ถือว่ามีเชื้อเพลิง (ใช้ index ด้วย code)
+LC_HAS_FUEL = np.array([False, True, True, True])
+
+# MCD12Q1 LC_Type1 → code (lookup table 256 ช่อง)
+MCD12Q1_TO_LC = np.zeros(256, dtype=np.uint8)
+MCD12Q1_TO_LC[1:6] = LC_FOREST
+MCD12Q1_TO_LC[6:8] = LC_SHRUB
+MCD12Q1_TO_LC[8:10] = LC_SAVANNA
+
+
+# NDVI breaks ของ ndvi_to_fuel_model (ใช้กับ np.digitize ในเวอร์ชันกริด)
+NDVI_FUEL_BREAKS = (0.25, 0.45)
+NDVI_FUEL_MODEL_IDS = (1, 8, 10)
+
+# ===== Rothermel constants =====
+ROTHERMEL_CONSTANTS = {
+    "H_BTUlb": 7881.0,
+    "SAVcar_ftinv": 5705.38,
+    "fd_ft": 0.4125,
+    "Dme_r": 0.20,
+    "totMineral_r": 0.0555,
+    "effectMineral_r": 0.01,
+}
+
+
 # ===== Utility =====
 def ndvi_to_fuel_model(ndvi: float, landcover: str) -> int:
     if ndvi < 0.25:
@@ -127,14 +202,7 @@ def calculate_ros(
     fmc = float(np.clip(base, 12.0, 55.0))  # 12–55%
     mdOnDry = fmc / 100.0
 
-    constants = {
-        "H_BTUlb": 7881.0,
-        "SAVcar_ftinv": 5705.38,
-        "fd_ft": 0.4125,
-        "Dme_r": 0.20,
-        "totMineral_r": 0.0555,
-        "effectMineral_r": 0.01,
-    }
+    constants = ROTHERMEL_CONSTANTS
 
     slope_rad = math.atan(min(float(slope_tan), math.tan(math.radians(35.0))))
 
@@ -202,8 +270,167 @@ def calculate_ros(
         return 0.0
 
 
+def ndvi_to_fuel_model_grid(ndvi: np.ndarray) -> np.ndarray:
+    """เวอร์ชันกริดของ ndvi_to_fuel_model → index 0..2 ของ NDVI_FUEL_MODEL_IDS"""
+    return np.digitize(ndvi, NDVI_FUEL_BREAKS, right=False)
+
+
+# ROS ต่ำกว่านี้ถือว่าไฟไม่ลาม
+ROS_CUTOFF_MPS = 0.010
+
+
+def rothermel_base_terms(
+    slope_tan: np.ndarray,
+    ndvi: np.ndarray,
+    lst_celsius: np.ndarray,
+    landcover: np.ndarray,
+    dtype=np.float64,
+) -> Dict[str, np.ndarray]:
+    """
+    ส่วนของ calculate_ros ที่ไม่ขึ้นกับลม (RI, PFR, EHN, QIG, Beta — คำนวณครั้งเดียวต่อ environment)
+    ROS = r0 * (1 + wind_coefficient(wind) * phi_w + phi_s)
+        = base_ros + wind_coefficient(wind) * wind_gain
+    - r0: RI * PFR / (ODBD * EHN * QIG) (m/s)
+    - phi_w: (Beta / Beta_op)^-Ec × 0.6 ถ้าเป็นป่า
+    - phi_s: SC (slope factor)
+    - base_ros: r0 * (1 + phi_s) = ROS ตอนลมสงบ (ก่อน cutoff)
+    - wind_gain: r0 * phi_w
+    - valid: เซลล์ที่ slope / NDVI ไม่เป็น NaN
+    - dtype: float32 → ใช้หน่วยความจำชั่วคราวครึ่งหนึ่ง (compact mode)
+    """
+    slope_tan = np.asarray(slope_tan, dtype=dtype)
+    ndvi = np.asarray(ndvi, dtype=dtype)
+    lst_celsius = np.asarray(lst_celsius, dtype=dtype)
+
+    c = ROTHERMEL_CONSTANTS
+    sa, bd, dem = c["SAVcar_ftinv"], c["fd_ft"], c["Dme_r"]
+    hc, tm, em = c["H_BTUlb"], c["totMineral_r"], c["effectMineral_r"]
+
+    # ---------- ค่าคงที่ (ไม่ขึ้นกับเซลล์) ----------
+    Beta_op = 3.348 * sa**-0.8189
+    A = 133.0 / sa**0.7913
+    T_max = sa**1.5 / (495.0 + 0.0594 * sa**1.5)
+    NS = 0.174 * em**-0.19
+    Ec = 0.715 * math.exp(-0.000359 * sa)
+    EHN = math.exp(-138.0 / sa)
+
+    # ---------- ตารางตาม fuel model ----------
+    fl1h = np.array([FUEL_MODELS[m]["fl1h_tac"] for m in NDVI_FUEL_MODEL_IDS])
+    dens = np.array([FUEL_MODELS[m]["fuelDens"] for m in NDVI_FUEL_MODEL_IDS])
+    ODBD_m = fl1h / bd
+    Beta_m = ODBD_m / dens
+    WN_m = fl1h * (1.0 - tm)
+    T_m = T_max * (Beta_m / Beta_op) ** A * np.exp(A * (1 - Beta_m / Beta_op))
+    PFR_m = (192.0 + 0.2595 * sa) ** -1 * np.exp(
+        (0.792 + 0.681 * math.sqrt(sa)) * (Beta_m + 0.1)
+    )
+    WCk_m = (Beta_m / Beta_op) ** -Ec
+    SCk_m = 5.275 * Beta_m**-0.3
+    T_m, WN_m, PFR_m, ODBD_m, WCk_m, SCk_m = (
+        m.astype(dtype) for m in (T_m, WN_m, PFR_m, ODBD_m, WCk_m, SCk_m)
+    )
+
+    # ---------- ต่อเซลล์ ----------
+    valid = ~(np.isnan(slope_tan) | np.isnan(ndvi))
+    ndvi0 = np.where(valid, ndvi, 0.0)
+    fm = ndvi_to_fuel_model_grid(ndvi0)
+
+    # FMC: NDVI(+), LST(−) ; LST เป็น NaN → ไม่หัก (เหมือน max(0.0, nan) ของเวอร์ชันสเกลาร์)
+    lst_excess = lst_celsius - 25.0
+    lst_excess = np.where(lst_excess > 0.0, lst_excess, 0.0)
+    fmc = np.clip(15 + 60 * ndvi0 - 0.6 * lst_excess, 12.0, 55.0)
+    mdOnDry = fmc / 100.0
+
+    moisture_ratio = mdOnDry / dem
+    NM = np.maximum(
+        0.05,
+        1.0
+        - 2.59 * moisture_ratio
+        + 5.11 * moisture_ratio**2
+        - 3.52 * moisture_ratio**3,
+    )
+    RI = T_m[fm] * WN_m[fm] * hc * NM * NS
+
+    phi_w = WCk_m[fm] * np.where(landcover_to_codes(landcover) == LC_FOREST, 0.6, 1.0)
+
+    slope0 = np.where(valid, slope_tan, 0.0)
+    slope_rad = np.arctan(np.minimum(slope0, math.tan(math.radians(35.0))))
+    phi_s = SCk_m[fm] * np.tan(slope_rad) ** 2
+
+    QIG = 250.0 + 1116.0 * mdOnDry
+    denom = ODBD_m[fm] * EHN * QIG
+    r0 = (RI * PFR_m[fm]) / denom * 0.3048 / 60.0  # ft/min → m/s
+
+    return {
+        "r0": r0,
+        "phi_w": phi_w,
+        "phi_s": phi_s,
+        "base_ros": r0 * (1 + phi_s),
+        "wind_gain": r0 * phi_w,
+        "valid": valid,
+    }
+
+
+def wind_coefficient(wind_mps: float) -> float:
+    """Cc * U^Bc ของ Rothermel (mid-flame wind + cap) — ส่วนเดียวที่ขึ้นกับความเร็วลม"""
+    sa = ROTHERMEL_CONSTANTS["SAVcar_ftinv"]
+    Bc = 0.02526 * sa**0.54
+    Cc = 7.47 * math.exp(-0.1333 * sa**0.55)
+
+    k_midflame = 0.60
+    wind_mps_eff = max(0.0, min(float(wind_mps) * k_midflame, 7.5))
+    wind_ftmin = wind_mps_eff * 196.85
+    return Cc * wind_ftmin**Bc
+
+
+def apply_wind_slope(
+    terms: Dict[str, np.ndarray], wind_mps: float, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    ROS (m/s) จาก rothermel_base_terms + ลม: base_ros + C·U^B × wind_gain (1 multiply-add)
+    - ไฟอ่อนกว่า ROS_CUTOFF_MPS / เซลล์ไม่ valid → 0
+    - out: เขียนผลลง array เดิม (ไม่ allocate ใหม่)
+    """
+    out = np.multiply(terms["wind_gain"], wind_coefficient(wind_mps), out=out)
+    out += terms["base_ros"]
+    out[~(terms["valid"] & (out >= ROS_CUTOFF_MPS))] = 0.0
+    return out
+
+
+def calculate_ros_grid(
+    slope_tan: np.ndarray,
+    ndvi: np.ndarray,
+    lst_celsius: np.ndarray,
+    wind_mps: float,
+    landcover: np.ndarray,
+) -> np.ndarray:
+    """
+    calculate_ros แบบ array-in/array-out (สูตรเดียวกันทุกประการ)
+    - = apply_wind_slope(rothermel_base_terms(...), wind) ; simulator แยก 2 ขั้นเพื่อ cache ส่วนที่ไม่ขึ้นกับลม
+    - คืน ros_grid (m/s), เซลล์ NaN / ไฟอ่อนกว่า cutoff → 0
+    """
+    return apply_wind_slope(
+        rothermel_base_terms(slope_tan, ndvi, lst_celsius, landcover), wind_mps
+    )
+
+
 # ===== Fetch data from GEE =====
-def fetch_patch_from_gee(lat, lon, month, grid_x, grid_y, cell_size, year=2025):
+# timeout (วินาที) ต่อ layer ของการดึงแบบขนาน
+GEE_LAYER_TIMEOUT_S = float(os.getenv("GEE_LAYER_TIMEOUT_S", "60"))
+
+# ชุดข้อมูล GEE ที่ใช้ (เป็นส่วนหนึ่งของ cache key → เปลี่ยนเวอร์ชันแล้ว cache เก่าไม่ถูกใช้)
+GEE_DATASETS = {
+    "dem": "USGS/SRTMGL1_003",
+    "s2": "COPERNICUS/S2_SR_HARMONIZED",
+    "lst": "MODIS/061/MOD11A2",
+    "landcover": "MODIS/061/MCD12Q1",
+}
+
+
+def patch_region_bounds(
+    lat: float, lon: float, grid_x: int, grid_y: int, cell_size: float
+) -> Tuple[float, float, float, float]:
+    """ขอบเขต (west, south, east, north) เป็นองศา ของ patch ที่มีศูนย์กลางที่ (lat, lon)"""
     meters_per_deg_lat = 111320.0
     meters_per_deg_lon = meters_per_deg_lat * math.cos(math.radians(lat))
     half_width_m = (grid_x * cell_size) / 2.0
@@ -212,12 +439,102 @@ def fetch_patch_from_gee(lat, lon, month, grid_x, grid_y, cell_size, year=2025):
     half_dx_deg = half_width_m / meters_per_deg_lon if meters_per_deg_lon > 0 else 0.0
     half_dy_deg = half_height_m / meters_per_deg_lat
 
-    region = ee.Geometry.Rectangle(
-        [lon - half_dx_deg, lat - half_dy_deg, lon + half_dx_deg, lat + half_dy_deg]
+    return (lon - half_dx_deg, lat - half_dy_deg, lon + half_dx_deg, lat + half_dy_deg)
+
+
+def _sample_rectangle(image, band: str, region, default_value) -> np.ndarray:
+    return np.array(
+        image.sampleRectangle(region=region, defaultValue=default_value)
+        .get(band)
+        .getInfo()
+    )
+
+
+def _sample_layers_with_timeout(
+    layer_args: Dict[str, tuple], timeout: float
+) -> Tuple[Dict[str, np.ndarray], List[Tuple[str, BaseException]]]:
+    """ดึงทุก layer พร้อมกัน รอรวมไม่เกิน timeout → (ผลที่ได้, [(layer ที่พัง, error)])"""
+    results: Dict[str, np.ndarray] = {}
+    failed: List[Tuple[str, BaseException]] = []
+
+    pool = ThreadPoolExecutor(max_workers=len(layer_args))
+    try:
+        futures = {
+            name: pool.submit(_sample_rectangle, *args)
+            for name, args in layer_args.items()
+        }
+        deadline = time.time() + timeout
+        for name, fut in futures.items():
+            try:
+                results[name] = fut.result(timeout=max(0.0, deadline - time.time()))
+            except Exception as e:
+                fut.cancel()
+                failed.append((name, e))
+    finally:
+        # ไม่รอ thread ที่ค้าง (getInfo ยกเลิกกลางทางไม่ได้) → คืนการควบคุมตาม timeout
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results, failed
+
+
+def _sample_layers_concurrently(
+    layer_args: Dict[str, tuple], timeout: Optional[float] = None
+) -> Dict[str, np.ndarray]:
+    """
+    ยิง sampleRectangle(...).getInfo() ของทุก layer พร้อมกัน (thread pool)
+    → latency ≈ round trip ที่ช้าที่สุด แทนผลรวมของทุก layer
+    - timeout: วินาทีต่อรอบ (ค่าเริ่มต้น GEE_LAYER_TIMEOUT_S)
+    - fallback: layer ที่ timeout / error จะถูกดึงซ้ำอีก 1 รอบ (timeout เท่าเดิม) ถ้ายังพังจึง raise
+      → รวมแล้วรอไม่เกิน ~2 × timeout
+    """
+    timeout = GEE_LAYER_TIMEOUT_S if timeout is None else timeout
+    results, failed = _sample_layers_with_timeout(layer_args, timeout)
+    if not failed:
+        return results
+
+    retried, still_failed = _sample_layers_with_timeout(
+        {name: layer_args[name] for name, _ in failed}, timeout
     )
+    results.update(retried)
+    if still_failed:
+        first_err = dict(failed)
+        name, e = still_failed[0]
+        raise RuntimeError(f"GEE layer '{name}' fetch failed: {e!r}") from first_err[name]
+    return results
+
+
+# เดือนที่ขอไม่มีภาพ S2 → fallback ไปช่วง ±N เดือน
+S2_FALLBACK_MONTHS = 1
+
+
+def _month_start(year: int, month: int, offset: int = 0) -> str:
+    """วันแรกของเดือน (year, month) เลื่อนไป offset เดือน → YYYY-MM-01"""
+    y, m = divmod(int(year) * 12 + int(month) - 1 + offset, 12)
+    return f"{y:04d}-{m + 1:02d}-01"
+
+
+def gee_composite_window(month: int, year: int) -> Dict[str, Tuple[str, str]]:
+    """
+    ช่วงวันที่ [start, end) ของ composite แต่ละ layer (รวมช่วง fallback)
+    - ใช้ทั้งใน _gee_layers และ tile cache key → เปลี่ยนกฎ fallback แล้ว tile เก่าไม่ถูกใช้
+    """
+    return {
+        "month": (_month_start(year, month), _month_start(year, month, 1)),
+        "s2_fallback": (
+            _month_start(year, month, -S2_FALLBACK_MONTHS),
+            _month_start(year, month, 1 + S2_FALLBACK_MONTHS),
+        ),
+        "lst_fallback": (f"{int(year):04d}-01-01", f"{int(year):04d}-12-31"),
+        "landcover": ("2001-01-01", f"{int(year):04d}-12-31"),
+    }
+
+
+def _gee_layers(region, month: int, year: int) -> Dict[str, Tuple[Any, str, float]]:
+    """สร้าง ee.Image ของ 4 layer → {ชื่อ band: (image, band, defaultValue)}"""
+    ee = init_gee()
+    window = gee_composite_window(month, year)
 
     # ---------- DEM / slope ----------
-    dem = ee.Image("USGS/SRTMGL1_003")
+    dem = ee.Image(GEE_DATASETS["dem"])
     slope_deg = ee.Terrain.slope(dem).rename("slope_deg")
 
     # ---------- Sentinel-2 NDVI (พร้อม fallback ถ้าเดือนนั้นว่าง) ----------
@@ -226,19 +543,15 @@ def fetch_patch_from_gee(lat, lon, month, grid_x, grid_y, cell_size, year=2025):
         # keep SCL not cloud/shadow and < 8 (veg/soil/water etc.)
         return image.updateMask(scl.neq(3).And(scl.neq(6)).And(scl.lt(8)))
 
-    s2_base = ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED").filterBounds(region)
-    month_start = ee.Date.fromYMD(year, month, 1)
-    month_end = month_start.advance(1, "month")
+    s2_base = ee.ImageCollection(GEE_DATASETS["s2"]).filterBounds(region)
 
-    s2_month = s2_base.filterDate(month_start, month_end).map(mask_s2)
-    # ถ้าเดือนนี้ไม่มีภาพ ให้ fallback ไปช่วง +/-1 เดือน
+    s2_month = s2_base.filterDate(*window["month"]).map(mask_s2)
+    # ถ้าเดือนนี้ไม่มีภาพ ให้ fallback ไปช่วง +/-S2_FALLBACK_MONTHS เดือน
     s2_coll = ee.ImageCollection(
         ee.Algorithms.If(
             s2_month.size().gt(0),
             s2_month,
-            s2_base.filterDate(
-                month_start.advance(-1, "month"), month_end.advance(1, "month")
-            ).map(mask_s2),
+            s2_base.filterDate(*window["s2_fallback"]).map(mask_s2),
         )
     )
     s2_img = ee.Image(
@@ -249,24 +562,20 @@ def fetch_patch_from_gee(lat, lon, month, grid_x, grid_y, cell_size, year=2025):
     ndvi = s2_img.normalizedDifference(["B8", "B4"]).rename("NDVI")
 
     # ---------- MODIS LST (พร้อม fallback ถ้าว่าง) ----------
-    lst_coll_base = ee.ImageCollection("MODIS/061/MOD11A2").select("LST_Day_1km")
-    lst_month = lst_coll_base.filterDate(month_start, month_end)
+    lst_coll_base = ee.ImageCollection(GEE_DATASETS["lst"]).select("LST_Day_1km")
+    lst_month = lst_coll_base.filterDate(*window["month"])
     lst_coll = ee.ImageCollection(
         ee.Algorithms.If(
             lst_month.size().gt(0),
             lst_month,
-            lst_coll_base.filterDate(
-                ee.Date.fromYMD(year, 1, 1), ee.Date.fromYMD(year, 12, 31)
-            ),
+            lst_coll_base.filterDate(*window["lst_fallback"]),
         )
     )
     lst_img = ee.Image(lst_coll.mean()).multiply(0.02).subtract(273.15).rename("LST")
 
     # ---------- MODIS Land Cover (แก้ null ด้วยการเลือก "ตัวล่าสุดที่มีอยู่ ≤ ปีที่ขอ" หรือ "ล่าสุดทั้งหมด") ----------
-    lc_all = ee.ImageCollection("MODIS/061/MCD12Q1")
-    lc_le_year = lc_all.filterDate(
-        ee.Date.fromYMD(2001, 1, 1), ee.Date.fromYMD(year, 12, 31)
-    )
+    lc_all = ee.ImageCollection(GEE_DATASETS["landcover"])
+    lc_le_year = lc_all.filterDate(*window["landcover"])
     lc_img = ee.Image(
         ee.Algorithms.If(
             lc_le_year.size().gt(0),
@@ -275,23 +584,43 @@ def fetch_patch_from_gee(lat, lon, month, grid_x, grid_y, cell_size, year=2025):
         )
     ).select("LC_Type1")
 
-    # ---------- Sample to numpy ----------
-    slope_deg_arr = np.array(
-        slope_deg.sampleRectangle(region=region, defaultValue=0)
-        .get("slope_deg")
-        .getInfo()
-    )
-    ndvi_arr = np.array(
-        ndvi.sampleRectangle(region=region, defaultValue=0).get("NDVI").getInfo()
-    )
-    lst_arr = np.array(
-        lst_img.sampleRectangle(region=region, defaultValue=25).get("LST").getInfo()
-    )
-    lc_arr = np.array(
-        lc_img.sampleRectangle(region=region, defaultValue=0).get("LC_Type1").getInfo()
-    )
+    return {
+        "slope_deg": (slope_deg, "slope_deg", 0),
+        "NDVI": (ndvi, "NDVI", 0),
+        "LST": (lst_img, "LST", 25),
+        "LC_Type1": (lc_img, "LC_Type1", 0),
+    }
+
+
+# หมายเหตุ: MCD12Q1 รหัส 1–5 = forest, 6–7 = shrub, 8–9 = savanna (0 มักเป็นน้ำ)
+def mcd12q1_to_codes(lc_arr: np.ndarray) -> np.ndarray:
+    """LC_Type1 (ตัวเลข, อาจเป็น float/NaN จาก GEE) → uint8 code ผ่าน MCD12Q1_TO_LC"""
+    raw = np.nan_to_num(np.asarray(lc_arr, dtype=np.float64), nan=0.0)
+    return MCD12Q1_TO_LC[np.clip(raw, 0, 255).astype(np.uint8)]
+
+
+def landcover_to_codes(landcover: np.ndarray) -> np.ndarray:
+    """
+    รับ landcover ได้ทั้งชื่อ class (string แบบเดิม เช่นไฟล์ .npz เก่า) และ code → คืน uint8 code
+    """
+    landcover = np.asarray(landcover)
+    if landcover.dtype.kind in ("U", "S", "O"):
+        codes = np.zeros(landcover.shape, dtype=np.uint8)
+        for code, name in enumerate(LANDCOVER_CLASSES):
+            codes[landcover == name] = code
+        return codes
+    return landcover.astype(np.uint8, copy=False)
+
+
+def landcover_names(codes: np.ndarray) -> np.ndarray:
+    """uint8 code → ชื่อ class (ใช้ตอนรายงานผลเท่านั้น)"""
+    return np.asarray(LANDCOVER_CLASSES)[np.asarray(codes)]
+
+
+def _to_grid(slope_deg_arr, ndvi_arr, lst_arr, lc_arr, grid_x, grid_y):
+    """resize (nearest) เป็นขนาดกริด แล้วแปลง slope → tan, LC_Type1 → landcover code (uint8)"""
+    import cv2
 
-    # ---------- Resize และแปลง ----------
     slope_deg_resized = cv2.resize(
         slope_deg_arr, (grid_x, grid_y), interpolation=cv2.INTER_NEAREST
     )
@@ -303,24 +632,268 @@ def fetch_patch_from_gee(lat, lon, month, grid_x, grid_y, cell_size, year=2025):
 
     slope_tan_resized = np.tan(np.deg2rad(slope_deg_resized))
 
-    # หมายเหตุ: MCD12Q1 รหัส 1–5 = forest, 6–7 = shrub, 8–9 = savanna (0 มักเป็นน้ำ)
-    def lc_class(code):
-        if code in [1, 2, 3, 4, 5]:
-            return "forest"
-        if code in [6, 7]:
-            return "shrub"
-        if code in [8, 9]:
-            return "savanna"
-        return "other"
-
     return (
         slope_tan_resized,
         ndvi_resized,
         lst_resized,
-        np.vectorize(lc_class)(lc_resized),
+        mcd12q1_to_codes(lc_resized),
+    )
+
+
+def fetch_patch_from_gee(lat, lon, month, grid_x, grid_y, cell_size, year=2025):
+    ee = init_gee()
+    region = ee.Geometry.Rectangle(
+        list(patch_region_bounds(lat, lon, grid_x, grid_y, cell_size))
+    )
+    layers = _gee_layers(region, month, year)
+
+    # ---------- Sample to numpy (4 layer พร้อมกัน) ----------
+    sampled = _sample_layers_concurrently(
+        {
+            name: (image, band, region, default)
+            for name, (image, band, default) in layers.items()
+        }
+    )
+
+    # ---------- Resize และแปลง ----------
+    return _to_grid(
+        sampled["slope_deg"],
+        sampled["NDVI"],
+        sampled["LST"],
+        sampled["LC_Type1"],
+        grid_x,
+        grid_y,
     )
 
 
+# ===== Tiled fetch (พื้นที่ใหญ่เกินขีดจำกัด pixel ของ sampleRectangle) =====
+# tile ยึด lattice องศาทั่วโลก (tile_deg) → incident ใกล้กันใช้ tile ซ้ำได้ผ่าน tile_cache
+# แต่ละ tile ถูก reproject เป็น EPSG:4326 ขนาด tile_px × tile_px (ไม่เกิน limit 262,144 px = 512²)
+# tile_px คำนวณจาก cell_size (ปัดขึ้นเป็นพหุคูณ GEE_TILE_PX_STEP ให้ tile cache ใช้ซ้ำได้)
+# GEE_TILE_PX > 0 → บังคับ tile_px คงที่
+GEE_TILE_DEG = float(os.getenv("GEE_TILE_DEG", "0.05"))
+GEE_TILE_PX = int(os.getenv("GEE_TILE_PX", "0"))
+GEE_TILE_PX_STEP = 32
+GEE_TILE_MAX_PX = 512
+GEE_TILE_WORKERS = int(os.getenv("GEE_TILE_WORKERS", "4"))
+TILE_LAYERS = ("slope_deg", "ndvi", "lst", "lc_code")
+
+
+def tile_px_for_cell_size(cell_size: float, tile_deg: float = GEE_TILE_DEG) -> int:
+    """
+    จำนวน pixel ต่อด้านของ tile ให้ pixel ไม่หยาบกว่า cell_size (วัดตามแนวเหนือ-ใต้)
+    ⚠️ เกิน GEE_TILE_MAX_PX → ถูกจำกัด (0.05° ≈ 10.9 m) ; ต้องการละเอียดกว่านี้ให้ลด GEE_TILE_DEG
+    """
+    px = math.ceil(tile_deg * 111320.0 / max(float(cell_size), 1e-6))
+    px = math.ceil(px / GEE_TILE_PX_STEP) * GEE_TILE_PX_STEP
+    return int(min(max(px, GEE_TILE_PX_STEP), GEE_TILE_MAX_PX))
+
+
+def _fetch_gee_tile(
+    tx: int,
+    ty: int,
+    month: int,
+    year: int,
+    tile_deg: float,
+    tile_px: int,
+    tile_cache=None,
+    layers: Optional[Callable[[], Dict[str, Tuple[Any, str, float]]]] = None,
+    composite_tiles: Optional[Tuple[int, int, int, int]] = None,
+) -> Tuple[np.ndarray, ...]:
+    """
+    ดึง 1 tile (ยังไม่แปลงหน่วย) → (slope_deg, ndvi, lst, lc_code) ขนาด tile_px × tile_px
+    - layers: ฟังก์ชันคืน layer ที่สร้างจาก region ทั้ง patch (composite เดียวกันทุก tile → ไม่มีรอยต่อ)
+      None → สร้างจากขอบเขต tile นี้เอง
+    - composite_tiles: ช่วง tile (tx0, ty0, tx1, ty1) ที่ layers ใช้สร้าง composite (None → tile นี้)
+      ผลของ S2 / LST ขึ้นกับ region ของ composite → เป็นส่วนหนึ่งของ cache key
+    """
+    if composite_tiles is None:
+        composite_tiles = (tx, ty, tx, ty)
+    key = None
+    if tile_cache is not None:
+        key = tile_cache.make_key(
+            tile=[tx, ty],
+            tile_deg=tile_deg,
+            tile_px=tile_px,
+            month=int(month),
+            year=int(year),
+            datasets=GEE_DATASETS,
+            composite_tiles=[int(t) for t in composite_tiles],
+            composite_window=gee_composite_window(month, year),
+        )
+        cached = tile_cache.get(key, names=TILE_LAYERS)
+        if cached is not None:
+            return cached
+
+    import cv2
+
+    ee = init_gee()
+    px_deg = tile_deg / tile_px
+    region = ee.Geometry.Rectangle(
+        [tx * tile_deg, ty * tile_deg, (tx + 1) * tile_deg, (ty + 1) * tile_deg]
+    )
+    tile_layers = layers() if layers is not None else _gee_layers(region, month, year)
+    sampled = _sample_layers_concurrently(
+        {
+            name: (
+                image.reproject(crs="EPSG:4326", crsTransform=[px_deg, 0, 0, 0, -px_deg, 0]),
+                band,
+                region,
+                default,
+            )
+            for name, (image, band, default) in tile_layers.items()
+        }
+    )
+    # ขอบ tile อาจคลาดไป ±1 pixel → บังคับให้เป็น tile_px × tile_px
+    tile = tuple(
+        cv2.resize(
+            sampled[name].astype(np.float64),
+            (tile_px, tile_px),
+            interpolation=cv2.INTER_NEAREST,
+        )
+        for name in ("slope_deg", "NDVI", "LST", "LC_Type1")
+    )
+
+    if tile_cache is not None:
+        tile_cache.put(key, tile, names=TILE_LAYERS)
+    return tile
+
+
+def fetch_patch_from_gee_tiled(
+    lat,
+    lon,
+    month,
+    grid_x,
+    grid_y,
+    cell_size,
+    year=2025,
+    tile_deg: float = GEE_TILE_DEG,
+    tile_px: Optional[int] = None,
+    tile_cache=None,
+):
+    """
+    fetch_patch_from_gee สำหรับพื้นที่ระดับจังหวัด (หลายสิบ km)
+    - แบ่ง region เป็น tile ตาม lattice → ดึงพร้อมกัน (GEE_TILE_WORKERS) → ต่อเป็น mosaic
+    - crop ตามขอบเขต region แล้ว resize เป็นขนาดกริด (เหมือนเวอร์ชัน single-shot)
+    - tile_px: None → GEE_TILE_PX หรือคำนวณจาก cell_size (tile_px_for_cell_size)
+    - tile_cache: อ็อบเจกต์ที่มี make_key / get / put (เช่น store.patch_cache.PatchCache)
+    """
+    if tile_px is None:
+        tile_px = GEE_TILE_PX or tile_px_for_cell_size(cell_size, tile_deg)
+    west, south, east, north = patch_region_bounds(lat, lon, grid_x, grid_y, cell_size)
+    tx0, tx1 = math.floor(west / tile_deg), math.floor(east / tile_deg)
+    ty0, ty1 = math.floor(south / tile_deg), math.floor(north / tile_deg)
+
+    # composite (S2 / LST / LC) สร้างครั้งเดียวจากขอบเขตรวมของทุก tile
+    # → fallback ช่วงเดือนตัดสินครั้งเดียว ไม่ต่างกันระหว่าง tile ; สร้างเมื่อมี tile ที่ไม่อยู่ใน cache
+    shared: Dict[str, Dict[str, Tuple[Any, str, float]]] = {}
+    shared_lock = threading.Lock()
+
+    def patch_layers() -> Dict[str, Tuple[Any, str, float]]:
+        with shared_lock:
+            if "layers" not in shared:
+                region = init_gee().Geometry.Rectangle(
+                    [tx0 * tile_deg, ty0 * tile_deg, (tx1 + 1) * tile_deg, (ty1 + 1) * tile_deg]
+                )
+                shared["layers"] = _gee_layers(region, month, year)
+            return shared["layers"]
+
+    coords = [(tx, ty) for ty in range(ty1, ty0 - 1, -1) for tx in range(tx0, tx1 + 1)]
+    with ThreadPoolExecutor(max_workers=max(1, GEE_TILE_WORKERS)) as pool:
+        tiles = list(
+            pool.map(
+                lambda c: _fetch_gee_tile(
+                    c[0],
+                    c[1],
+                    month,
+                    year,
+                    tile_deg,
+                    tile_px,
+                    tile_cache,
+                    patch_layers,
+                    (tx0, ty0, tx1, ty1),
+                ),
+                coords,
+            )
+        )
+
+    # ---------- Stitch (แถวบนสุด = tile ทิศเหนือ) ----------
+    n_cols = tx1 - tx0 + 1
+    mosaic = []
+    for k in range(len(TILE_LAYERS)):
+        rows = [
+            np.hstack([tiles[r * n_cols + c][k] for c in range(n_cols)])
+            for r in range(len(coords) // n_cols)
+        ]
+        mosaic.append(np.vstack(rows))
+
+    # ---------- Crop ตาม region ----------
+    px_deg = tile_deg / tile_px
+    origin_w, origin_n = tx0 * tile_deg, (ty1 + 1) * tile_deg
+    c0 = max(0, int(math.floor((west - origin_w) / px_deg)))
+    c1 = max(c0 + 1, int(math.ceil((east - origin_w) / px_deg)))
+    r0 = max(0, int(math.floor((origin_n - north) / px_deg)))
+    r1 = max(r0 + 1, int(math.ceil((origin_n - south) / px_deg)))
+    slope_deg_arr, ndvi_arr, lst_arr, lc_arr = (m[r0:r1, c0:c1] for m in mosaic)
+
+    return _to_grid(slope_deg_arr, ndvi_arr, lst_arr, lc_arr, grid_x, grid_y)
+
+
+# ===== Firebreak (morphology บนกริด) =====
+# square: kernel สี่เหลี่ยม (2w+1)² (ระยะ Chebyshev) ; round: วงกลมรัศมี w เซลล์ (ระยะ Euclidean)
+FIREBREAK_SHAPES = ("square", "round")
+
+
+def firebreak_distance(burning: np.ndarray, shape: str = "square") -> np.ndarray:
+    """ระยะ (หน่วยเซลล์) จากแต่ละเซลล์ถึงเซลล์ burning ที่ใกล้สุด (ไม่มี burning → inf)"""
+    if shape not in FIREBREAK_SHAPES:
+        raise ValueError(f"Unknown firebreak shape '{shape}', expected one of {FIREBREAK_SHAPES}")
+    if not burning.any():
+        return np.full(burning.shape, np.inf, dtype=np.float32)
+
+    import cv2
+
+    # distanceTransform วัดระยะถึงพิกเซล 0 ที่ใกล้สุด → เซลล์ไหม้ = 0
+    src = np.where(burning, 0, 1).astype(np.uint8)
+    if shape == "square":
+        return cv2.distanceTransform(src, cv2.DIST_C, 3)
+    return cv2.distanceTransform(src, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+
+
+def firebreak_rings(
+    burning: np.ndarray,
+    widths_cells: Sequence[int],
+    shape: str = "square",
+    blocked: Optional[np.ndarray] = None,
+) -> List[np.ndarray]:
+    """
+    วงแนวกันไฟรอบ burning (bool) หลายความกว้างในครั้งเดียว
+    - distance transform ครั้งเดียว แล้ว threshold ต่อความกว้าง → ต้นทุนไม่ขึ้นกับความกว้าง
+    - blocked: เซลล์ที่ห้ามเป็นแนวกันไฟ (เช่น กำลังไหม้ / ไหม้แล้ว / พื้นที่ยกเว้น)
+    """
+    dist = firebreak_distance(burning, shape)
+    rings = []
+    for w in widths_cells:
+        ring = dist <= w
+        if blocked is not None:
+            ring &= ~blocked
+        rings.append(ring)
+    return rings
+
+
+# ===== Snapshot serialization =====
+def snapshot_to_bytes(snap: Dict[str, Any]) -> bytes:
+    """snapshot() → bytes (npz บีบอัด ไม่ใช้ pickle) สำหรับเก็บ / ส่งข้าม process"""
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **{name: np.asarray(value) for name, value in snap.items()})
+    return buf.getvalue()
+
+
+def snapshot_from_bytes(data: bytes) -> Dict[str, Any]:
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
 # ===== Simulator =====
 class IntegratedRothermelFireSimulator:
     def __init__(
@@ -336,7 +909,15 @@ class IntegratedRothermelFireSimulator:
         sim_minutes: int,
         dt: int = 10,  # s
         min_neighbors_to_ignite: int = 1,
+        engine: str = "sweep",
+        patch_provider: Optional[Callable[..., Tuple[np.ndarray, ...]]] = None,
+        wind_schedule: Optional[List[Tuple[float, float, float]]] = None,
+        compact: bool = False,
+        kernel: str = "python",
     ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+
         self.lat, self.lon, self.month = float(lat), float(lon), int(month)
         self.grid_x, self.grid_y, self.cell_size = (
             int(grid_x),
@@ -345,7 +926,21 @@ class IntegratedRothermelFireSimulator:
         )
         self.sim_time, self.dt = int(sim_minutes * 60), int(max(1, dt))
         self.wind_speed, self.wind_dir = float(max(0.0, wind_speed)), float(wind_dir)
+        self._base_wind = (self.wind_speed, self.wind_dir)
         self.min_neighbors_to_ignite = int(min_neighbors_to_ignite)
+        self.engine = engine
+        self.set_kernel(kernel)
+        # compact: state uint8, เวลา/ROS float32, fuel mask ตั้งต้นแบบ bit-packed, ไม่มี fuel_left
+        self.compact = bool(compact)
+        # ลมเปลี่ยนตามเวลา: [(t วินาที, wind_speed, wind_dir), ...] มีผลตั้งแต่ step แรกที่ >= t
+        self.set_wind_schedule(wind_schedule or [])
+        self._wind_t_floor = 0.0  # ห้ามจุดติดก่อนเวลาที่ลมเปลี่ยนครั้งล่าสุด
+        # เซลล์ที่กำลังไหม้ตอนลมเปลี่ยน: เวลาเริ่มลามเสมือนต่อทิศ (แถวของ _spread_origin)
+        # → ระยะที่ลามไปแล้วด้วยลมเดิมไม่หาย ; None = ยังไม่เคยเปลี่ยนลมระหว่างรัน
+        self._origin_slot: Optional[np.ndarray] = None
+        self._spread_origin: Optional[np.ndarray] = None
+        # แหล่งข้อมูล patch: ค่าเริ่มต้นดึงจาก GEE (ส่ง cache / offline provider แทนได้)
+        self.patch_provider = patch_provider or fetch_patch_from_gee
 
         # Tuners (boosted for more realistic spread)
         self.spread_gain = 1.5  # 1.1 → 2.4
@@ -354,10 +949,14 @@ class IntegratedRothermelFireSimulator:
         self.ndvi_fuel_threshold = 0.24  # 0.23 → 0.18
 
         # Grids
-        self.state = np.zeros((self.grid_y, self.grid_x), dtype=np.int32)
-        self.ignition_time = np.full((self.grid_y, self.grid_x), np.inf)
-        self.required_burn_duration = np.full((self.grid_y, self.grid_x), np.inf)
-        self.ros_grid = np.full((self.grid_y, self.grid_x), np.nan)
+        shape = (self.grid_y, self.grid_x)
+        state_dtype, real_dtype = (
+            (np.uint8, np.float32) if self.compact else (np.int32, np.float64)
+        )
+        self.state = np.zeros(shape, dtype=state_dtype)
+        self.ignition_time = np.full(shape, np.inf, dtype=real_dtype)
+        self.required_burn_duration = np.full(shape, np.inf, dtype=real_dtype)
+        self.ros_grid = np.full(shape, np.nan, dtype=real_dtype)
 
         # Queues & timers
         self.ignite_queue: list[tuple[float, int, int, float]] = []
@@ -367,6 +966,14 @@ class IntegratedRothermelFireSimulator:
         self.start_i, self.start_j = None, None
         self._tried_sources = set()  # ✅ จดจำแหล่งตั้งต้นที่ใช้ไปแล้ว
         self._last_source_flat: Optional[int] = None
+        # flat index ของเซลล์ที่จุดติดแล้วตามลำดับ (หาจุดเผาเสร็จล่าสุดโดยไม่สแกนทั้งกริด)
+        self._ignited = array("q")
+        self._burned_out = array("q")  # flat index ของเซลล์ที่มอดแล้วตามลำดับ (delta ของแนวไฟ)
+        # step ถัดไปที่ยังไม่ประมวลผล → run_simulation รันต่อจากจุดที่หยุดไว้ได้ (fork / checkpoint)
+        self._t_next = 0
+        self._t_done = 0  # เวลาจำลองที่รันถึงแล้ว (วินาที)
+        # False → ไฟดับแล้วไม่ย้ายไปตั้งต้นที่เซลล์ถัดไป (ใช้วัดผลการกักไฟของแนวกันไฟ)
+        self.reseed = True
 
         self.initialize_simulation()
 
@@ -391,6 +998,30 @@ class IntegratedRothermelFireSimulator:
             return 0.0
         return float(self.dir_base + (1.0 - self.dir_base) * cos_th)
 
+    def _direction_gains(self) -> np.ndarray:
+        """k ต่อ offset เพื่อนบ้าน (ลำดับ NEIGHBOR_OFFSETS) ; 0 = ทวนลม ไม่ลาม"""
+        # เพื่อนบ้าน (i+dy, j+dx) ลามมาหาเซลล์ (i, j)
+        return np.array(
+            [self.directional_scale(dy, dx, 0, 0) * self.spread_gain for dy, dx in NEIGHBOR_OFFSETS]
+        )
+
+    def _build_spread_table(self) -> None:
+        """
+        ตาราง spread factor ต่อ offset เพื่อนบ้าน 8 ทิศ (คำนวณครั้งเดียวต่อการรัน)
+        - ลมมีทิศเดียวทั้งกริด และ slope proxy ใช้ทิศเพื่อนบ้าน (ไม่มี aspect ต่อเซลล์)
+          → directional_scale ขึ้นกับ offset เท่านั้น
+        - แต่ละแถว: (dy, dx, k, dist, d) โดย ros_eff = ros(เพื่อนบ้าน) * k, delay = dist / ros_eff
+          และ d = ลำดับใน NEIGHBOR_OFFSETS (คอลัมน์ของ _spread_origin)
+        - ตัด offset ที่ scale = 0 (ทวนลม) ออกไปเลย
+        """
+        table = []
+        for d, ((dy, dx), k) in enumerate(zip(NEIGHBOR_OFFSETS, self._direction_gains())):
+            if k <= 0:
+                continue
+            table.append((dy, dx, float(k), float(_OFFSET_DIST[d] * self.cell_size), d))
+        self._spread_table = table
+        self._spread_array = np.array(table, dtype=np.float64).reshape(-1, 5)
+
     # ---------- Initialization ----------
     def initialize_simulation(self):
         self.load_environmental_data()
@@ -398,41 +1029,70 @@ class IntegratedRothermelFireSimulator:
         self.set_initial_conditions()
 
     def load_environmental_data(self):
-        slope_arr, ndvi_arr, lst_arr, lc_arr = fetch_patch_from_gee(
+        slope_arr, ndvi_arr, lst_arr, lc_arr = self.patch_provider(
             self.lat, self.lon, self.month, self.grid_x, self.grid_y, self.cell_size
         )
+        if self.compact:
+            slope_arr, ndvi_arr, lst_arr = (
+                np.asarray(a, dtype=np.float32) for a in (slope_arr, ndvi_arr, lst_arr)
+            )
         self.slope_data, self.ndvi_data, self.lst_data, self.landcover_data = (
             slope_arr,
             ndvi_arr,
             lst_arr,
-            lc_arr,
+            landcover_to_codes(lc_arr),
         )
 
-        self.fuel_mask = (
-            (self.ndvi_data > self.ndvi_fuel_threshold)
-            & np.isin(self.landcover_data, ["forest", "shrub", "savanna"])
-        ).astype(np.int32)
-        self.fuel_left = np.ones((self.grid_y, self.grid_x), dtype=np.float32)
+        fuel = (self.ndvi_data > self.ndvi_fuel_threshold) & LC_HAS_FUEL[
+            self.landcover_data
+        ]
+        # สำเนาตั้งต้น (_seed_source แก้ fuel_mask ได้) → ใช้ตอน reset / clone
+        if self.compact:
+            self.fuel_mask = fuel.astype(np.uint8)
+            self._fuel_mask0 = np.packbits(fuel, axis=None)
+            self.fuel_left = None
+        else:
+            self.fuel_mask = fuel.astype(np.int32)
+            self._fuel_mask0 = self.fuel_mask.copy()
+            self.fuel_left = np.ones((self.grid_y, self.grid_x), dtype=np.float32)
+
+    def _initial_fuel_mask(self) -> np.ndarray:
+        if self.compact:
+            n = self.grid_y * self.grid_x
+            return np.unpackbits(self._fuel_mask0, count=n).reshape(self.grid_y, self.grid_x)
+        return self._fuel_mask0.copy()
 
     def compute_ros_with_rothermel_model(self):
         t0 = time.time()
-        for i in range(self.grid_y):
-            for j in range(self.grid_x):
-                if self.fuel_mask[i, j] == 0:
-                    self.ros_grid[i, j] = 0.0
-                    continue
-                ros = calculate_ros(
-                    self.slope_data[i, j],
-                    self.ndvi_data[i, j],
-                    self.lst_data[i, j],
-                    self.wind_speed,
-                    str(self.landcover_data[i, j]),
-                )
-                self.ros_grid[i, j] = (
-                    0.0 if (ros is None or np.isnan(ros) or ros <= 0) else ros
-                )
+        # เก็บส่วนที่ไม่ขึ้นกับลมไว้ → ลมเปลี่ยนคิดใหม่แค่ (1 + WC + SC)
+        self.ros_terms = rothermel_base_terms(
+            self.slope_data,
+            self.ndvi_data,
+            self.lst_data,
+            self.landcover_data,
+            dtype=self.ros_grid.dtype,
+        )
+        if self.compact:
+            # เก็บเฉพาะที่ apply_wind_slope ใช้
+            self.ros_terms = {
+                k: self.ros_terms[k] for k in ("base_ros", "wind_gain", "valid")
+            }
+        self.ros_for_wind(self.wind_speed, out=self.ros_grid)
         self.ros_computation_time = time.time() - t0
 
+    @property
+    def base_ros_grid(self) -> np.ndarray:
+        """ROS ตอนลมสงบ (m/s) ต่อเซลล์ — เซลล์ไม่มีเชื้อเพลิง → 0"""
+        return np.where(self.fuel_mask == 0, 0.0, self.ros_terms["base_ros"])
+
+    def ros_for_wind(
+        self, wind_speed: float, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """ros_grid ที่ความเร็วลม wind_speed จาก ros_terms (ไม่แตะ state ของการจำลอง)"""
+        out = apply_wind_slope(self.ros_terms, wind_speed, out=out)
+        out[self.fuel_mask == 0] = 0.0
+        return out
+
     def _is_viable_source(self, i: int, j: int) -> bool:
         if not (0 <= i < self.grid_y and 0 <= j < self.grid_x):
             return False
@@ -450,8 +1110,10 @@ class IntegratedRothermelFireSimulator:
 
         self.state[i, j] = BURNING
         self.ignition_time[i, j] = ignite_t
+        self._ignited.append(flat)
         self.fuel_mask[i, j] = 1
-        self.fuel_left[i, j] = 1.0
+        if self.fuel_left is not None:
+            self.fuel_left[i, j] = 1.0
 
         ros0 = max(1e-6, float(self.ros_grid[i, j]))
         self.required_burn_duration[i, j] = ta(self.cell_size, ros0) / (
@@ -486,8 +1148,9 @@ class IntegratedRothermelFireSimulator:
                 return (i, j)
         return None
 
-    def set_initial_conditions(self):
-        cy, cx = self.grid_y // 2, self.grid_x // 2
+    def set_initial_conditions(self, ignition: Optional[Tuple[int, int]] = None):
+        """จุดตั้งต้น: ignition (i, j) ถ้าระบุ ไม่งั้นกลางกริด (ไม่มีเชื้อเพลิง → หาแบบ spiral)"""
+        cy, cx = ignition if ignition is not None else (self.grid_y // 2, self.grid_x // 2)
         if self._is_viable_source(cy, cx):
             si, sj = cy, cx
         else:
@@ -498,114 +1161,735 @@ class IntegratedRothermelFireSimulator:
             si, sj = pick
         self._seed_source(si, sj, ignite_t=0.0)
 
-    def get_neighbors(self, y: int, x: int) -> List[Tuple[int, int]]:
-        neighbors = []
-        for dy in (-1, 0, 1):
-            for dx in (-1, 0, 1):
-                if dy == 0 and dx == 0:
+    def reset(
+        self,
+        ignition: Optional[Tuple[int, int]] = None,
+        sim_minutes: Optional[int] = None,
+        wind_speed: Optional[float] = None,
+        wind_dir: Optional[float] = None,
+        wind_schedule: Optional[List[Tuple[float, float, float]]] = None,
+    ) -> None:
+        """
+        ล้างเฉพาะ state ของการจำลอง แล้วพร้อมรันใหม่บน environment เดิม
+        (ไม่ดึง GEE / ไม่คำนวณ Rothermel ใหม่ — ถ้าลมเปลี่ยนคิดแค่ ros_for_wind)
+        - ignition: จุดตั้งต้น (i, j) ; None → กลางกริดเหมือนตอนสร้าง
+        - wind_speed / wind_dir: None → ใช้ลมตอนสร้าง
+        - wind_schedule: None → คงตารางเดิม ; [] → ลมคงที่
+        """
+        if sim_minutes is not None:
+            self.sim_time = int(sim_minutes * 60)
+        self.fuel_mask[:] = self._initial_fuel_mask()
+
+        speed = self._base_wind[0] if wind_speed is None else float(max(0.0, wind_speed))
+        direction = self._base_wind[1] if wind_dir is None else float(wind_dir)
+        if speed != self.wind_speed:
+            self.ros_for_wind(speed, out=self.ros_grid)
+        self.wind_speed, self.wind_dir = speed, direction
+        if wind_schedule is not None:
+            self.set_wind_schedule(wind_schedule)
+        self._wind_t_floor = 0.0
+        self._origin_slot, self._spread_origin = None, None
+
+        if self.fuel_left is not None:
+            self.fuel_left.fill(1.0)
+        self.state.fill(UNBURNED)
+        self.ignition_time.fill(np.inf)
+        self.required_burn_duration.fill(np.inf)
+        self.ignite_queue = []
+        self.execution_time = 0.0
+
+        self.start_i, self.start_j = None, None
+        self._tried_sources = set()
+        self._last_source_flat = None
+        self._ignited = array("q")
+        self._burned_out = array("q")
+        self._t_next, self._t_done = 0, 0
+
+        self.set_initial_conditions(ignition)
+
+    def clone(
+        self,
+        wind_speed: Optional[float] = None,
+        wind_dir: Optional[float] = None,
+        wind_schedule: Optional[List[Tuple[float, float, float]]] = None,
+    ) -> "IntegratedRothermelFireSimulator":
+        """
+        simulator ตัวใหม่บน environment เดียวกัน (พร้อมรัน)
+        - แชร์ slope / NDVI / LST / landcover / ros_terms แบบอ่านอย่างเดียว
+        - state, คิว, fuel_mask, ros_grid แยกของใครของมัน
+        - wind_*: ลมตั้งต้นของตัวใหม่ (None → ลมตั้งต้นของต้นฉบับ)
+        """
+        other = copy.copy(self)
+        other.fuel_mask = self._initial_fuel_mask()
+        other.fuel_left = None if self.fuel_left is None else np.ones_like(self.fuel_left)
+        other.ros_grid = self.ros_grid.copy()
+        other.state = np.zeros_like(self.state)
+        other.ignition_time = np.full_like(self.ignition_time, np.inf)
+        other.required_burn_duration = np.full_like(self.required_burn_duration, np.inf)
+        other.wind_schedule = list(self.wind_schedule)
+
+        speed = self._base_wind[0] if wind_speed is None else float(max(0.0, wind_speed))
+        direction = self._base_wind[1] if wind_dir is None else float(wind_dir)
+        other._base_wind = (speed, direction)
+        other.reset(wind_schedule=wind_schedule)
+        return other
+
+    def fork(self) -> "IntegratedRothermelFireSimulator":
+        """
+        สำเนาการจำลอง ณ จุดที่รันถึง (checkpoint) แล้วรันต่อแยกกันได้
+        - environment (slope / NDVI / LST / landcover / ros_terms) แชร์แบบอ่านอย่างเดียว
+        - state, เวลา, คิว, fuel_mask, ros_grid, ตัวติดตามแหล่งไฟ คัดลอกแยก
+        """
+        other = copy.copy(self)
+        for name in ("state", "ignition_time", "required_burn_duration", "fuel_mask", "ros_grid"):
+            setattr(other, name, getattr(self, name).copy())
+        if self.fuel_left is not None:
+            other.fuel_left = self.fuel_left.copy()
+        other.ignite_queue = list(self.ignite_queue)
+        other.wind_schedule = list(self.wind_schedule)
+        other._tried_sources = set(self._tried_sources)
+        other._ignited = array("q", self._ignited)
+        other._burned_out = array("q", self._burned_out)
+        if self._origin_slot is not None:
+            other._origin_slot = self._origin_slot.copy()
+            other._spread_origin = self._spread_origin.copy()
+        return other
+
+    # ---------- Snapshot / resume ----------
+    @property
+    def elapsed_s(self) -> int:
+        """เวลาจำลองที่รันถึงแล้ว (วินาที)"""
+        return self._t_done
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        state แบบเคลื่อนไหวทั้งหมด ณ ตอนนี้ (ไม่รวม environment) → restore / fork ข้าม process ได้
+        - เก็บแบบ sparse: ขนาดตามจำนวนเซลล์ที่ไฟไปถึง + คิว ไม่ใช่ขนาดกริด
+        - fuel_mask เก็บเฉพาะเซลล์ที่ต่างจาก mask ตั้งต้น ; fuel_left เป็น 1 เสมอ → ไม่เก็บ
+        """
+        state = self.state.ravel()
+        ign = self.ignition_time.ravel()
+        ignited = np.frombuffer(self._ignited, dtype=np.int64).copy()
+        timed = np.flatnonzero(np.isfinite(ign))
+        marked = np.flatnonzero(state)
+        fuel_diff = np.flatnonzero(self.fuel_mask.ravel() != self._initial_fuel_mask().ravel())
+        queue = self.ignite_queue
+        if self._origin_slot is None:
+            origin_idx, origin_val = np.empty(0, dtype=np.int64), np.empty((0, 8))
+        else:
+            origin_idx = np.flatnonzero(self._origin_slot.ravel() >= 0)
+            origin_val = self._spread_origin[self._origin_slot.ravel()[origin_idx]]
+        return {
+            "shape": np.array(self.state.shape, dtype=np.int64),
+            "compact": self.compact,
+            "sim_time": self.sim_time,
+            "t_next": self._t_next,
+            "t_done": self._t_done,
+            "reseed": self.reseed,
+            "wind": np.array([self.wind_speed, self.wind_dir, self._wind_t_floor]),
+            "wind_schedule": np.array(self.wind_schedule, dtype=np.float64).reshape(-1, 3),
+            "state_idx": marked,
+            "state_val": state[marked].astype(np.uint8),
+            "time_idx": timed,
+            "time_val": ign[timed],
+            "ignited": ignited,
+            "burn_dur": self.required_burn_duration.ravel()[ignited],
+            "fuel_idx": fuel_diff,
+            "fuel_val": self.fuel_mask.ravel()[fuel_diff],
+            "queue_t": np.array([e[0] for e in queue], dtype=np.float64),
+            "queue_ij": np.array([(e[1], e[2]) for e in queue], dtype=np.int64).reshape(-1, 2),
+            "queue_dur": np.array([e[3] for e in queue], dtype=np.float64),
+            "tried_sources": np.array(sorted(self._tried_sources), dtype=np.int64),
+            "sources": np.array(
+                [
+                    -1 if self._last_source_flat is None else self._last_source_flat,
+                    -1 if self.start_i is None else self.start_i,
+                    -1 if self.start_j is None else self.start_j,
+                ],
+                dtype=np.int64,
+            ),
+            "origin_idx": origin_idx,
+            "origin_val": origin_val,
+        }
+
+    def restore(self, snap: Dict[str, Any]) -> None:
+        """คืน state จาก snapshot() (environment ต้องเป็นชุดเดียวกัน) แล้วรันต่อได้ทันที"""
+        if tuple(int(n) for n in snap["shape"]) != self.state.shape:
+            raise ValueError(
+                f"Snapshot grid {tuple(snap['shape'])} does not match simulator grid {self.state.shape}"
+            )
+        if bool(snap["compact"]) != self.compact:
+            raise ValueError("Snapshot compact mode does not match simulator")
+
+        self.sim_time = int(snap["sim_time"])
+        self._t_next, self._t_done = int(snap["t_next"]), int(snap["t_done"])
+        self.reseed = bool(snap["reseed"])
+
+        speed, direction, t_floor = (float(v) for v in snap["wind"])
+        if speed != self.wind_speed:
+            self.ros_for_wind(speed, out=self.ros_grid)
+        self.wind_speed, self.wind_dir, self._wind_t_floor = speed, direction, t_floor
+        self.wind_schedule = [tuple(row) for row in np.asarray(snap["wind_schedule"]).tolist()]
+
+        self.state.fill(UNBURNED)
+        self.state.ravel()[snap["state_idx"]] = snap["state_val"]
+        self.ignition_time.fill(np.inf)
+        self.ignition_time.ravel()[snap["time_idx"]] = snap["time_val"]
+        self.required_burn_duration.fill(np.inf)
+        self.required_burn_duration.ravel()[snap["ignited"]] = snap["burn_dur"]
+        self.fuel_mask[:] = self._initial_fuel_mask()
+        self.fuel_mask.ravel()[snap["fuel_idx"]] = snap["fuel_val"]
+        if self.fuel_left is not None:
+            self.fuel_left.fill(1.0)
+
+        ignited = np.asarray(snap["ignited"], dtype=np.int64)
+        self._ignited = array("q", ignited.tobytes())
+        # ลำดับการมอดไม่ได้เก็บใน snapshot → ใช้ลำดับการจุดติด
+        burned_out = ignited[self.state.ravel()[ignited] == BURNED]
+        self._burned_out = array("q", burned_out.tobytes())
+        # ลำดับใน list คือโครงสร้าง heap เดิม → ไม่ต้อง heapify ใหม่
+        self.ignite_queue = list(
+            zip(
+                np.asarray(snap["queue_t"]).tolist(),
+                np.asarray(snap["queue_ij"])[:, 0].tolist(),
+                np.asarray(snap["queue_ij"])[:, 1].tolist(),
+                np.asarray(snap["queue_dur"]).tolist(),
+            )
+        )
+        self._tried_sources = set(np.asarray(snap["tried_sources"]).tolist())
+        last, si, sj = (int(v) for v in snap["sources"])
+        self._last_source_flat = None if last < 0 else last
+        self.start_i, self.start_j = (None, None) if si < 0 else (si, sj)
+
+        origin_idx = np.asarray(snap["origin_idx"], dtype=np.int64)
+        self._origin_slot, self._spread_origin = None, None
+        if origin_idx.size:
+            self._origin_slot = np.full(self.state.shape, -1, dtype=np.int32)
+            self._origin_slot.ravel()[origin_idx] = np.arange(origin_idx.size, dtype=np.int32)
+            self._spread_origin = np.asarray(snap["origin_val"], dtype=np.float64).reshape(-1, 8).copy()
+
+    def run_until(
+        self,
+        t_s: float,
+        show_progress: bool = False,
+        progress_cb: Optional[Callable[[int, int], None]] = None,
+    ) -> float:
+        """
+        รันต่อจากจุดที่หยุดไว้ถึงเวลา t_s วินาที (เช่น dashboard เดินทีละ 15 นาที)
+        - ผลเท่ากับรันรวดเดียว ; t_s เกิน sim_time → ขยาย sim_time ตาม
+        """
+        horizon = max(self.sim_time, int(t_s))
+        self.sim_time = int(t_s)
+        try:
+            return self.run_simulation(show_progress=show_progress, progress_cb=progress_cb)
+        finally:
+            self.sim_time = horizon
+
+    def nbytes(self) -> int:
+        """หน่วยความจำของกริดทั้งหมด (ใช้จำกัดขนาด cache)"""
+        arrays = [v for v in vars(self).values() if isinstance(v, np.ndarray)]
+        arrays += list(getattr(self, "ros_terms", {}).values())
+        return int(sum(a.nbytes for a in arrays))
+
+    # ---------- Ignition helpers ----------
+    def _step_after(self, t: float) -> int:
+        """step แรกที่ > t"""
+        return (int(t) // self.dt + 1) * self.dt
+
+    def _next_source(self) -> Optional[Tuple[int, int]]:
+        """แหล่งตั้งต้นถัดไปเมื่อไฟดับ (None ถ้าปิด reseed)"""
+        if not self.reseed:
+            return None
+        return self.find_next_viable_source_linear_after(self._last_source_flat)
+
+    def _step_ceil(self, t: float) -> float:
+        """เวลา step แรกที่ >= t (ตรงกับจังหวะที่ sweep engine มองเห็นเหตุการณ์)"""
+        return math.ceil(t / self.dt) * self.dt
+
+    def _ignite(self, i: int, j: int, ignite_t: float) -> None:
+        self.state[i, j] = BURNING
+        self.ignition_time[i, j] = ignite_t
+        self._ignited.append(i * self.grid_x + j)
+        ros_target = max(1e-6, float(self.ros_grid[i, j]))
+        self.required_burn_duration[i, j] = ta(self.cell_size, ros_target) / (
+            self.spread_gain * 1.15
+        )
+
+    def _evaluate_ignition(self, i: int, j: int) -> None:
+        """ประเมินเวลาจุดติดของเซลล์ UNBURNED (i,j) จากเพื่อนบ้านที่กำลังไหม้ แล้ว push เข้าคิว"""
+        burning_neighbors = 0
+        best_t, best_dur = np.inf, np.inf
+        state, grid_y, grid_x = self.state, self.grid_y, self.grid_x
+        slots = self._origin_slot
+
+        for dy, dx, k, dist, d in self._spread_table:
+            ny, nx = i + dy, j + dx
+            if not (0 <= ny < grid_y and 0 <= nx < grid_x):
+                continue
+            if state[ny, nx] != BURNING:
+                continue
+            ros_eff = float(self.ros_grid[ny, nx]) * k
+            if not ros_eff > 0:  # รวม NaN
+                continue
+
+            delay = dist / ros_eff
+            if slots is not None and slots[ny, nx] >= 0:  # ไหม้อยู่ก่อนลมเปลี่ยน
+                ignite_t = float(self._spread_origin[slots[ny, nx], d]) + delay
+            else:
+                ignite_t = float(self.ignition_time[ny, nx]) + delay
+
+            if ignite_t < np.inf:
+                burning_neighbors += 1
+                if ignite_t < best_t:
+                    best_t, best_dur = ignite_t, delay
+
+        if burning_neighbors >= self.min_neighbors_to_ignite and best_t < np.inf:
+            # ถ้าเพื่อนบ้านเดียว: ตอนนี้ single_neighbor_penalty เป็นค่าลบ → โบนัส
+            if burning_neighbors == 1:
+                best_dur *= 1.0 + self.single_neighbor_penalty
+                best_t += self.single_neighbor_penalty * best_dur
+
+            # ✅ โบนัสใหม่: เพื่อนบ้านไหม้ ≥ 2 → ลดดีเลย์ 15%
+            if burning_neighbors >= 2:
+                best_dur *= 0.97
+                best_t -= 0.03 * best_dur
+
+            # ลมเพิ่งเปลี่ยน: จุดติดย้อนหลังไม่ได้ (กันค่าปัดเศษ / โบนัสเพื่อนบ้านดันเวลาถอยหลัง)
+            if best_t < self._wind_t_floor:
+                best_t = self._wind_t_floor
+
+            cutoff = best_t + 1e-9
+            if self.compact:  # เทียบที่ความละเอียดของกริด ไม่งั้น push ซ้ำทุก step
+                cutoff = np.float32(cutoff)
+            if cutoff < self.ignition_time[i, j]:
+                self.ignition_time[i, j] = best_t
+                heapq.heappush(self.ignite_queue, (best_t, i, j, best_dur))
+
+    def resolved_engine(self) -> str:
+        """engine ที่ใช้จริง ("auto" → sweep ถ้า kernel เป็น numba หรือเซลล์ ≤ AUTO_SWEEP_MAX_CELL_M)"""
+        if self.engine != "auto":
+            return self.engine
+        if self.kernel == "numba" or self.cell_size <= AUTO_SWEEP_MAX_CELL_M:
+            return "sweep"
+        return "event"
+
+    # ---------- Compiled kernels (kernel="numba") ----------
+    def set_kernel(self, kernel: str) -> None:
+        """kernel ของ A2/A3: "python" (reference) | "numba" | "auto" (numba ถ้าติดตั้งไว้)"""
+        if kernel != "python":
+            import fire_kernels  # numba โหลดเมื่อเลือกใช้เท่านั้น
+
+            kernel = fire_kernels.resolve_kernel(kernel)
+        self.kernel = kernel
+
+    def _load_kernels(self) -> Tuple[Optional[Dict[str, Any]], Optional[tuple]]:
+        """
+        (kernel ที่ compile แล้ว, buffer ผลลัพธ์ (t, i, j, dur) ขนาดเท่ากริด)
+        → (None, None) เมื่อใช้ Python path
+        """
+        if self.kernel == "python":
+            return None, None
+        import fire_kernels
+
+        n = self.grid_y * self.grid_x
+        out = (
+            np.empty(n, dtype=np.float64),
+            np.empty(n, dtype=np.int64),
+            np.empty(n, dtype=np.int64),
+            np.empty(n, dtype=np.float64),
+        )
+        return fire_kernels.get_kernels(), out
+
+    def _evaluate_cells(
+        self,
+        cells_i: np.ndarray,
+        cells_j: np.ndarray,
+        kern: Optional[Dict[str, Any]],
+        out: Optional[tuple],
+    ) -> None:
+        """_evaluate_ignition ของเซลล์ UNBURNED ที่ระบุ ตามลำดับที่ส่งมา (ผ่าน kernel ถ้ามี)"""
+        if kern is None:
+            for i, j in zip(cells_i.tolist(), cells_j.tolist()):
+                if self.state[i, j] == UNBURNED:
+                    self._evaluate_ignition(i, j)
+            return
+
+        n = kern["evaluate_cells"](
+            cells_i,
+            cells_j,
+            self.state,
+            self.ros_grid,
+            self.ignition_time,
+            self._spread_array,
+            self.min_neighbors_to_ignite,
+            float(self.single_neighbor_penalty),
+            float(self._wind_t_floor),
+            self.compact,
+            self._origin_slot is not None,
+            _NO_ORIGIN_SLOT if self._origin_slot is None else self._origin_slot,
+            _NO_SPREAD_ORIGIN if self._spread_origin is None else self._spread_origin,
+            *out,
+        )
+        # push ตามลำดับที่ kernel พบ → คิวเหมือน Python path ทุก bit
+        out_t, out_i, out_j, out_dur = (a[:n].tolist() for a in out)
+        for entry in zip(out_t, out_i, out_j, out_dur):
+            heapq.heappush(self.ignite_queue, entry)
+
+    def _front_cells(self, burning: set) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        เซลล์ UNBURNED ที่มีเชื้อเพลิงติดกับเซลล์ที่กำลังไหม้ (burning = set ของ flat index)
+        → (rows, cols) เรียง row-major เหมือนลำดับที่ sweep เดินทั้งกริด
+        """
+        if not burning:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        flat = np.fromiter(burning, dtype=np.int64, count=len(burning))
+        ii = (flat // self.grid_x)[:, None] + _OFFSET_DY
+        jj = (flat % self.grid_x)[:, None] + _OFFSET_DX
+        inside = (ii >= 0) & (ii < self.grid_y) & (jj >= 0) & (jj < self.grid_x)
+        cand = np.unique(ii[inside] * self.grid_x + jj[inside])
+        cand = cand[
+            (self.state.ravel()[cand] == UNBURNED) & (self.fuel_mask.ravel()[cand] != 0)
+        ]
+        return cand // self.grid_x, cand % self.grid_x
+
+    def _burnout_step(self, i: int, j: int, t_now: float) -> float:
+        """step แรกที่ A3 ของ sweep engine จะเปลี่ยนเซลล์ (i,j) เป็น BURNED"""
+        ign = float(self.ignition_time[i, j])
+        dur = float(self.required_burn_duration[i, j])
+        t_out = max(t_now, self._step_ceil(ign + dur))
+        while (t_out - ign) / dur < 1.0:
+            t_out += self.dt
+        return t_out
+
+    # ---------- Wind schedule ----------
+    def set_wind_schedule(self, wind_schedule: List[Tuple[float, float, float]]) -> None:
+        """
+        ตั้งตารางลม [(t วินาที, wind_speed, wind_dir), ...] (เรียงตามเวลา, ความเร็วติดลบ → 0)
+        เรียกระหว่างรันได้ (เช่น ต่อตารางเมื่อ session เดินเลยช่วงเดิม) ; รายการที่ถึงเวลาแล้วมีผลที่ step ถัดไป
+        """
+        self.wind_schedule = sorted(
+            (float(t), float(max(0.0, ws)), float(wd)) for t, ws, wd in wind_schedule
+        )
+
+    def _next_wind_change(self, t_now: float) -> float:
+        """step ถัดไป (> t_now) ที่ลมใน wind_schedule เปลี่ยน"""
+        for t_change, _ws, _wd in self.wind_schedule:
+            step = self._step_ceil(t_change)
+            if step > t_now:
+                return step
+        return np.inf
+
+    def _apply_wind_schedule(self, t_now: float) -> set:
+        """ใช้ลมล่าสุดใน wind_schedule ที่ถึงเวลาแล้ว ณ step t_now → คืนเซลล์ที่ต้องประเมินใหม่"""
+        current = None
+        for t_change, ws, wd in self.wind_schedule:
+            if self._step_ceil(t_change) > t_now:
+                break
+            current = (ws, wd)
+        if current is None:
+            return set()
+        return self.set_wind(current[0], current[1], t_now)
+
+    def set_wind(self, wind_speed: float, wind_dir: float, t_now: float = 0.0) -> set:
+        """
+        เปลี่ยนลมระหว่างรัน (incremental)
+        - ความเร็วเปลี่ยน → ros_grid ใหม่จาก ros_terms (ไม่คำนวณ Rothermel ทั้งหมด)
+        - ทิศ/ความเร็วเปลี่ยน → สร้าง _spread_table ใหม่ (8 ค่า)
+        - การจุดติดที่รออยู่ในคิวของเซลล์แนวไฟถูกประเมินใหม่: ส่วนที่ลามไปแล้วด้วยลมเดิมคงไว้
+          ส่วนที่เหลือใช้ลมใหม่ → t_now + (1 - elapsed / old_delay) * new_delay
+          คิวที่ไม่มีเพื่อนบ้านไหม้เหลือแล้วคงเวลาเดิมไว้
+        คืนเซลล์แนวไฟที่ถูกประเมินใหม่
+        """
+        wind_speed = float(max(0.0, wind_speed))
+        speed_changed = wind_speed != self.wind_speed
+        if not speed_changed and float(wind_dir) == self.wind_dir:
+            return set()
+
+        burning = np.argwhere(self.state == BURNING)
+        bi, bj = burning[:, 0], burning[:, 1]
+        old_ros, old_gains = self.ros_grid[bi, bj].astype(np.float64), self._direction_gains()
+
+        self.wind_speed, self.wind_dir = wind_speed, float(wind_dir)
+        if speed_changed:
+            self.ros_for_wind(self.wind_speed, out=self.ros_grid)
+        self._build_spread_table()
+        self._wind_t_floor = float(t_now)
+        self._rebase_spread_origin(bi, bj, old_ros, old_gains, float(t_now))
+
+        # คิวที่ยังมีผล = ค่าต่ำสุดต่อเซลล์ (= ignition_time ของเซลล์ UNBURNED)
+        pending = {}
+        as_grid = self.ignition_time.dtype.type  # compact: เทียบแบบ float32
+        for entry in self.ignite_queue:
+            _t, i, j, _travel = entry
+            if self.state[i, j] == UNBURNED and as_grid(_t) == self.ignition_time[i, j]:
+                pending[(i, j)] = entry
+        self.ignite_queue = []
+        for i, j in pending:
+            self.ignition_time[i, j] = np.inf
+
+        frontier = set()
+        for i, j in burning:
+            for dy, dx in NEIGHBOR_OFFSETS:
+                ny, nx = int(i) + dy, int(j) + dx
+                if not (0 <= ny < self.grid_y and 0 <= nx < self.grid_x):
                     continue
-                ny, nx = y + dy, x + dx
-                if 0 <= ny < self.grid_y and 0 <= nx < self.grid_x:
-                    neighbors.append((ny, nx))
-        return neighbors
+                if self.state[ny, nx] == UNBURNED and self.fuel_mask[ny, nx] != 0:
+                    frontier.add((ny, nx))
+        for i, j in frontier:
+            self._evaluate_ignition(i, j)
+
+        for (i, j), entry in pending.items():
+            if self.ignition_time[i, j] == np.inf:
+                self.ignition_time[i, j] = entry[0]
+                heapq.heappush(self.ignite_queue, entry)
+        return frontier
+
+    def _rebase_spread_origin(
+        self,
+        bi: np.ndarray,
+        bj: np.ndarray,
+        old_ros: np.ndarray,
+        old_gains: np.ndarray,
+        t_now: float,
+    ) -> None:
+        """
+        เซลล์ที่กำลังไหม้ (bi, bj) ตอนลมเปลี่ยน: เก็บเวลาเริ่มลามเสมือนต่อทิศ
+        origin = t_now - (elapsed / old_delay) * new_delay → origin + new_delay = เวลาถึงเซลล์ถัดไป
+        (เปลี่ยนลมหลายครั้ง → elapsed นับจาก origin เดิม สะสมสัดส่วนระยะทางต่อกัน)
+        """
+        if bi.size == 0:
+            return
+        if self._origin_slot is None:
+            self._origin_slot = np.full(self.state.shape, -1, dtype=np.int32)
+            self._spread_origin = np.empty((0, len(NEIGHBOR_OFFSETS)))
+
+        slot = self._origin_slot[bi, bj]
+        new = slot < 0
+        if new.any():
+            n0 = self._spread_origin.shape[0]
+            slot[new] = np.arange(n0, n0 + int(new.sum()), dtype=np.int32)
+            self._origin_slot[bi[new], bj[new]] = slot[new]
+            start = np.repeat(
+                self.ignition_time[bi[new], bj[new]].astype(np.float64)[:, None],
+                len(NEIGHBOR_OFFSETS),
+                axis=1,
+            )
+            self._spread_origin = np.vstack([self._spread_origin, start])
+
+        dist = _OFFSET_DIST * self.cell_size
+        with np.errstate(divide="ignore", invalid="ignore"):
+            old_eff = old_ros[:, None] * old_gains[None, :]
+            new_eff = self.ros_grid[bi, bj].astype(np.float64)[:, None] * self._direction_gains()[None, :]
+            old_delay = np.where(old_eff > 0, dist / old_eff, np.inf)
+            new_delay = np.where(new_eff > 0, dist / new_eff, np.inf)
+            start = self._spread_origin[slot]
+            done = np.clip((t_now - start) / old_delay, 0.0, 1.0)  # สัดส่วนระยะที่ลามไปแล้ว
+            origin = t_now - done * new_delay
+        # ทิศที่ลมใหม่ไม่ลาม → origin ไม่ถูกใช้ ; กัน NaN (0 * inf)
+        self._spread_origin[slot] = np.where(np.isfinite(origin), origin, t_now)
 
     # ---------- Simulation ----------
-    def run_simulation(self, show_progress=True) -> float:
+    def run_simulation(
+        self,
+        show_progress=True,
+        progress_cb: Optional[Callable[[int, int], None]] = None,
+    ) -> float:
+        """
+        รันการจำลองจนครบ sim_time
+        - progress_cb(current_step, total_steps): เรียกทุก step ที่ประมวลผล (เช่น อัปเดต job)
+        """
+        self._build_spread_table()
+        if self.resolved_engine() == "event":
+            return self._run_event_driven(show_progress, progress_cb)
+
+        kern, out = self._load_kernels()
         start_time = time.time()
-        steps = range(0, self.sim_time + 1, self.dt)
+        steps = range(self._t_next, self.sim_time + 1, self.dt)
         total_steps = len(steps)
 
+        # active set: flat index ของเซลล์ BURNING + min-heap ของ (step ที่มอด, i, j)
+        # → ต้นทุนต่อ step ตามขนาดแนวไฟ ไม่ใช่ขนาดกริด
+        burning: set[int] = set()
+        burnouts: list[tuple[float, int, int]] = []
+
+        def track_burning(i: int, j: int, t_now: float) -> None:
+            heapq.heappush(burnouts, (self._burnout_step(i, j, t_now), i, j))
+            burning.add(i * self.grid_x + j)
+
+        for i, j in np.argwhere(self.state == BURNING):
+            track_burning(int(i), int(j), 0.0)
+
         for idx, t in enumerate(steps):
+            # A0) ลมเปลี่ยนตาม wind_schedule
+            if self.wind_schedule:
+                self._apply_wind_schedule(t)
+
             # A1) เปิดคิว: เปลี่ยนเป็น BURNING เฉพาะที่ถึงเวลาแล้ว
             while self.ignite_queue and self.ignite_queue[0][0] <= t:
                 ignite_t, ii, jj, _travel = heapq.heappop(self.ignite_queue)
                 if self.state[ii, jj] != UNBURNED:
                     continue
-                self.state[ii, jj] = BURNING
-                self.ignition_time[ii, jj] = ignite_t
-                ros_target = max(1e-6, float(self.ros_grid[ii, jj]))
-                self.required_burn_duration[ii, jj] = ta(self.cell_size, ros_target) / (
-                    self.spread_gain * 1.15
-                )
+                self._ignite(ii, jj, ignite_t)
+                track_burning(ii, jj, t)
 
             # ✅ Fallback next-start:
             # ถ้าไม่มีไฟกำลังไหม้ และคิวว่าง แต่ยังมีเซลล์เชื้อเพลิงที่จุดติดได้ → ตั้งต้นใหม่ทันทีที่เวลา t
-            if not np.any(self.state == BURNING) and not self.ignite_queue:
-                next_src = self.find_next_viable_source_linear_after(
-                    self._last_source_flat
-                )
+            if not burning and not self.ignite_queue:
+                next_src = self._next_source()
                 if next_src is not None and t < self.sim_time:
                     ni, nj = next_src
                     self._seed_source(ni, nj, ignite_t=float(t))
+                    track_burning(ni, nj, t)
                     # ดำเนินต่อไปในรอบเดียวกัน (ไม่ break)
                 else:
-                    # ไม่มีแหล่งเริ่มใหม่แล้ว → จบการจำลอง
+                    # ไม่มีแหล่งเริ่มใหม่แล้ว → จบการจำลอง (รันต่อ → ตรวจ step นี้อีกครั้ง)
+                    self._t_next = t
                     break
 
-            # A2) ประเมินการจุดติดใหม่สำหรับ UNBURNED
-            for i in range(self.grid_y):
-                for j in range(self.grid_x):
-                    if self.state[i, j] != UNBURNED or self.fuel_mask[i, j] == 0:
-                        continue
-
-                    burning_neighbors = 0
-                    best_t, best_dur = np.inf, np.inf
-
-                    for ny, nx in self.get_neighbors(i, j):
-                        if self.state[ny, nx] != BURNING:
-                            continue
-                        scale = self.directional_scale(ny, nx, i, j)
-                        ros_eff = self.ros_grid[ny, nx] * scale * self.spread_gain
-                        if ros_eff <= 0 or np.isnan(ros_eff):
-                            continue
-
-                        is_diag = abs(i - ny) == 1 and abs(j - nx) == 1
-                        delay = (
-                            td(self.cell_size, ros_eff)
-                            if is_diag
-                            else ta(self.cell_size, ros_eff)
-                        )
-                        ignite_t = self.ignition_time[ny, nx] + delay
-
-                        if ignite_t < np.inf:
-                            burning_neighbors += 1
-                            if ignite_t < best_t:
-                                best_t, best_dur = ignite_t, delay
-
-                    if (
-                        burning_neighbors >= self.min_neighbors_to_ignite
-                        and best_t < np.inf
-                    ):
-                        # ถ้าเพื่อนบ้านเดียว: ตอนนี้ single_neighbor_penalty เป็นค่าลบ → โบนัส
-                        if burning_neighbors == 1:
-                            best_dur *= 1.0 + self.single_neighbor_penalty
-                            best_t += self.single_neighbor_penalty * best_dur
-
-                        # ✅ โบนัสใหม่: เพื่อนบ้านไหม้ ≥ 2 → ลดดีเลย์ 15%
-                        if burning_neighbors >= 2:
-                            best_dur *= 0.97
-                            best_t -= 0.03 * best_dur
-
-                        if best_t + 1e-9 < self.ignition_time[i, j]:
-                            self.ignition_time[i, j] = best_t
-                            heapq.heappush(self.ignite_queue, (best_t, i, j, best_dur))
+            # A2) ประเมินการจุดติดใหม่สำหรับ UNBURNED ที่ติดแนวไฟ (เซลล์อื่นไม่มีเพื่อนบ้านไหม้)
+            self._evaluate_cells(*self._front_cells(burning), kern, out)
 
             # A3) อัปเดต BURNING → BURNED เมื่อครบเวลาเผา
-            for i in range(self.grid_y):
-                for j in range(self.grid_x):
-                    if self.state[i, j] == BURNING:
-                        burn_time = t - self.ignition_time[i, j]
-                        burn_dur = self.required_burn_duration[i, j]
-                        if np.isinf(burn_dur) or burn_time < 0:
-                            continue
-                        if (burn_time / burn_dur) >= 1.0:
-                            self.state[i, j] = BURNED
+            while burnouts and burnouts[0][0] <= t:
+                _, bi, bj = heapq.heappop(burnouts)
+                self.state[bi, bj] = BURNED
+                self._burned_out.append(bi * self.grid_x + bj)
+                burning.discard(bi * self.grid_x + bj)
 
             if show_progress and idx > 0 and (idx % 100 == 0 or idx == total_steps - 1):
                 show_progress_bar(idx + 1, total_steps)
+            if progress_cb is not None:
+                progress_cb(idx + 1, total_steps)
+        else:
+            self._t_next = max(self._t_next, self._step_after(self.sim_time))
+        self._t_done = max(self._t_done, (self.sim_time // self.dt) * self.dt)
+
+        if show_progress:
+            print()
+
+        self.execution_time = time.time() - start_time
+        return self.execution_time
+
+    def _run_event_driven(
+        self,
+        show_progress=True,
+        progress_cb: Optional[Callable[[int, int], None]] = None,
+    ) -> float:
+        """
+        Event-driven engine (minimum travel time / Dijkstra-style):
+        - กระโดดไปเฉพาะ step ที่มีเหตุการณ์ (pop จาก ignite_queue หรือเซลล์มอด) แทนการเดินทุก dt
+        - ประเมินการจุดติดเฉพาะเซลล์ที่ชุดเพื่อนบ้านที่กำลังไหม้เพิ่งเปลี่ยน (dirty) ไม่ใช่ทั้งกริด
+        - ชุดเพื่อนบ้านไม่เปลี่ยน = ผลประเมินเดิม → ได้ state / ignition_time /
+          required_burn_duration เหมือน sweep engine ทุกประการ ; ignite_queue มีรายการชุดเดียวกัน
+          แต่ลำดับใน list (โครงสร้าง heap) ต่างได้ เพราะประเมินเซลล์คนละลำดับ → pop ได้ลำดับเดียวกัน
+        - แนวไฟหนาแน่น + kernel numba: ช้ากว่า sweep (ดู ENGINES "auto")
+        """
+        kern, out = self._load_kernels()
+        start_time = time.time()
+        t_end = (self.sim_time // self.dt) * self.dt
+        total_steps = t_end // self.dt + 1
+        last_reported = 0
+
+        # min-heap ของ (step ที่มอด, i, j) สำหรับเซลล์ BURNING
+        burnouts: list[tuple[float, int, int]] = []
+        n_burning = 0
+        dirty: set[tuple[int, int]] = set()
+
+        def mark_neighbors(i: int, j: int) -> None:
+            for dy, dx in NEIGHBOR_OFFSETS:
+                ny, nx = i + dy, j + dx
+                if not (0 <= ny < self.grid_y and 0 <= nx < self.grid_x):
+                    continue
+                if self.state[ny, nx] == UNBURNED and self.fuel_mask[ny, nx] != 0:
+                    dirty.add((ny, nx))
+
+        def track_burning(i: int, j: int, t_now: float) -> None:
+            nonlocal n_burning
+            heapq.heappush(burnouts, (self._burnout_step(i, j, t_now), i, j))
+            n_burning += 1
+            mark_neighbors(i, j)
+
+        for i, j in np.argwhere(self.state == BURNING):
+            track_burning(int(i), int(j), 0.0)
+
+        t, stopped_at = float(self._t_next), None
+        while t <= t_end:
+            # A3 (ของ step ก่อนหน้า) → BURNED
+            while burnouts and burnouts[0][0] < t:
+                _, bi, bj = heapq.heappop(burnouts)
+                self.state[bi, bj] = BURNED
+                self._burned_out.append(bi * self.grid_x + bj)
+                n_burning -= 1
+                mark_neighbors(bi, bj)
+
+            # A0) ลมเปลี่ยนตาม wind_schedule
+            if self.wind_schedule:
+                dirty |= self._apply_wind_schedule(t)
+
+            # A1) เปิดคิว
+            while self.ignite_queue and self.ignite_queue[0][0] <= t:
+                ignite_t, ii, jj, _travel = heapq.heappop(self.ignite_queue)
+                if self.state[ii, jj] != UNBURNED:
+                    continue
+                self._ignite(ii, jj, ignite_t)
+                track_burning(ii, jj, t)
+
+            # ✅ Fallback next-start
+            if n_burning == 0 and not self.ignite_queue:
+                next_src = self._next_source()
+                if next_src is not None and t < self.sim_time:
+                    ni, nj = next_src
+                    self._seed_source(ni, nj, ignite_t=float(t))
+                    track_burning(ni, nj, t)
+                else:
+                    stopped_at = t
+                    break
+
+            # A2) ประเมินเฉพาะเซลล์ dirty
+            if dirty:
+                cells = np.array(list(dirty), dtype=np.int64)
+                self._evaluate_cells(
+                    np.ascontiguousarray(cells[:, 0]),
+                    np.ascontiguousarray(cells[:, 1]),
+                    kern,
+                    out,
+                )
+            dirty.clear()
+
+            idx = int(t // self.dt)
+            if show_progress and idx - last_reported >= 100:
+                last_reported = idx
+                show_progress_bar(idx + 1, total_steps)
+            if progress_cb is not None:
+                progress_cb(idx + 1, total_steps)
+
+            # step ถัดไปที่มีเหตุการณ์
+            t_next = np.inf
+            if self.ignite_queue:
+                t_next = self._step_ceil(self.ignite_queue[0][0])
+            if burnouts:
+                t_next = min(t_next, burnouts[0][0] + self.dt)
+            if self.wind_schedule:
+                t_next = min(t_next, self._next_wind_change(t))
+            t = max(t + self.dt, t_next)
+
+        # A3 ของ step สุดท้าย
+        while burnouts and burnouts[0][0] <= t_end:
+            _, bi, bj = heapq.heappop(burnouts)
+            self.state[bi, bj] = BURNED
+            self._burned_out.append(bi * self.grid_x + bj)
+        if stopped_at is not None:
+            self._t_next = int(stopped_at)
+        else:
+            self._t_next = max(self._t_next, self._step_after(self.sim_time))
+        self._t_done = max(self._t_done, t_end)
 
         if show_progress:
+            show_progress_bar(total_steps, total_steps)
             print()
+        if progress_cb is not None:
+            progress_cb(total_steps, total_steps)
 
         self.execution_time = time.time() - start_time
         return self.execution_time
@@ -643,18 +1927,40 @@ class IntegratedRothermelFireSimulator:
             },
         }
 
+    def front_cursor(self) -> Tuple[int, int]:
+        """ตำแหน่งปัจจุบันของ log จุดติด / มอด (ใช้กับ front_delta)"""
+        return len(self._ignited), len(self._burned_out)
+
+    def front_delta(
+        self, since: Tuple[int, int]
+    ) -> Tuple[np.ndarray, np.ndarray, Tuple[int, int]]:
+        """
+        เซลล์ที่จุดติด / มอดใหม่หลัง cursor since → (ignited, burned, cursor ใหม่)
+        เป็น flat index (i * grid_x + j) ; ต้นทุนตามขนาด delta ไม่ใช่ขนาดกริด
+        """
+        cursor = self.front_cursor()
+        ignited = np.array(self._ignited[since[0] : cursor[0]], dtype=np.int64)
+        burned = np.array(self._burned_out[since[1] : cursor[1]], dtype=np.int64)
+        return ignited, burned, cursor
+
     def get_last_ignition_point(self) -> Dict[str, Any]:
+        """เซลล์ที่เผาเสร็จช้าสุดภายใน sim_time (เสมอกัน → เซลล์แรกแบบ row-major)"""
         latest_time, li, lj = -1.0, -1, -1
-        for i in range(self.grid_y):
-            for j in range(self.grid_x):
-                if (
-                    self.state[i, j] > 0
-                    and not np.isinf(self.ignition_time[i, j])
-                    and not np.isinf(self.required_burn_duration[i, j])
-                ):
-                    comp = self.ignition_time[i, j] + self.required_burn_duration[i, j]
-                    if comp <= self.sim_time and comp > latest_time:
-                        latest_time, li, lj = comp, i, j
+        flat = np.frombuffer(self._ignited, dtype=np.int64)
+        if flat.size:
+            ign = self.ignition_time.ravel()[flat]
+            dur = self.required_burn_duration.ravel()[flat]
+            comp = ign + dur
+            ok = (
+                (self.state.ravel()[flat] > 0)
+                & np.isfinite(ign)
+                & np.isfinite(dur)
+                & (comp <= self.sim_time)
+            )
+            if ok.any():
+                latest_time = comp[ok].max()
+                last = int(flat[ok & (comp == latest_time)].min())
+                li, lj = divmod(last, self.grid_x)
 
         if li >= 0 and lj >= 0:
             lat_offset = (self.grid_y // 2 - li) * self.cell_size
@@ -670,44 +1976,84 @@ class IntegratedRothermelFireSimulator:
             }
         return {"found": False}
 
-    def mark_firebreak(self, width_m=8.0):
+    def _firebreak_width_cells(self, width_m: Any) -> np.ndarray:
+        """ความกว้าง (เมตร) → จำนวนเซลล์ (อย่างน้อย 1)"""
+        cells = np.rint(np.asarray(width_m, dtype=np.float64) / self.cell_size)
+        return np.maximum(1, cells).astype(np.int64)
+
+    def _firebreak_blocked(self, exclude: Optional[np.ndarray]) -> np.ndarray:
+        # ห้ามล้อมเซลล์ที่กำลังไหม้หรือไหม้แล้ว + พื้นที่ยกเว้น (ถนน / หมู่บ้าน / แหล่งน้ำ)
+        blocked = (self.state == BURNING) | (self.state == BURNED)
+        if exclude is not None:
+            blocked |= np.asarray(exclude, dtype=bool)
+        return blocked
+
+    def firebreak_layouts(
+        self,
+        layouts: Sequence[Dict[str, float]],
+        shape: str = "square",
+        exclude: Optional[np.ndarray] = None,
+    ) -> List[np.ndarray]:
+        """
+        แนวกันไฟตัวเลือกรอบแนวไฟปัจจุบัน (ไม่แก้ state) → mask ต่อ layout
+        - layout: {"distance_m": ห่างจากแนวไฟ, "width_m": ความกว้าง,
+          "arc_deg": ส่วนโค้งด้านใต้ลม (360 = ล้อมรอบ)}
+        - distance transform ครั้งเดียวใช้ร่วมทุก layout
+        """
+        burning = self.state == BURNING
+        dist = firebreak_distance(burning, shape)
+        blocked = self._firebreak_blocked(exclude)
+
+        bearing = None
+        if burning.any():
+            # ทิศ (0°=N ตามเข็ม) จากจุดศูนย์กลางแนวไฟ ; ไฟลามไปทาง wind_dir (ดู directional_scale)
+            ci, cj = np.argwhere(burning).mean(axis=0)
+            yy, xx = np.mgrid[0 : self.grid_y, 0 : self.grid_x]
+            bearing = np.degrees(np.arctan2(xx - cj, ci - yy)) % 360.0
+
+        masks = []
+        for layout in layouts:
+            d = max(0, int(round(float(layout.get("distance_m", 0.0)) / self.cell_size)))
+            w = int(self._firebreak_width_cells(layout.get("width_m", 8.0)))
+            mask = (dist > d) & (dist <= d + w) & ~blocked
+            arc = float(layout.get("arc_deg", 360.0))
+            if bearing is not None and arc < 360.0:
+                off = np.abs((bearing - self.wind_dir + 180.0) % 360.0 - 180.0)
+                mask &= off <= arc / 2.0
+            masks.append(mask)
+        return masks
+
+    def mark_firebreak(
+        self,
+        width_m: Any = 8.0,
+        shape: str = "square",
+        exclude: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
         """
         สร้างแนวกันไฟเป็น “วงล้อม” รอบเซลล์ที่ไฟกำลังลาม (state = BURNING)
-        - width_m: ความกว้างของแนวกันไฟ (เมตร)
+        - width_m: ความกว้างของแนวกันไฟ (เมตร) หรือกริดความกว้างต่อเซลล์ (ใช้ค่าที่เซลล์ไหม้)
+        - shape: "square" (เหมือนเดิม) | "round"
+        - exclude: bool mask ของเซลล์ที่ห้ามทำแนวกันไฟ
         """
-
-        width_cells = max(1, int(round(width_m / self.cell_size)))
-
-        firebreak_mask = np.zeros_like(self.state, dtype=bool)
-
-        # หาเซลล์ไฟกำลังลาม
-        burning_cells = np.argwhere(self.state == BURNING)
-
-        if len(burning_cells) == 0:
+        burning = self.state == BURNING
+        if not burning.any():
             print("⚠️ No BURNING cells → cannot create firebreak.")
-            return firebreak_mask
-
-        # สำหรับแต่ละเซลล์ที่กำลังลาม → สร้างวงล้อมด้านนอก
-        for i, j in burning_cells:
-
-            # ล้อมรอบด้วย square kernel width_cells
-            for dy in range(-width_cells, width_cells + 1):
-                for dx in range(-width_cells, width_cells + 1):
-                    ny, nx = i + dy, j + dx
+            return np.zeros_like(self.state, dtype=bool)
 
-                    # ขอบเขตจอ
-                    if 0 <= ny < self.grid_y and 0 <= nx < self.grid_x:
-
-                        # ห้ามล้อมเซลล์ที่กำลังไหม้หรือไหม้แล้ว
-                        if self.state[ny, nx] in (BURNING, BURNED):
-                            continue
-
-                        # mark เป็นแนวกันไฟ
-                        firebreak_mask[ny, nx] = True
+        blocked = self._firebreak_blocked(exclude)
+        width_cells = self._firebreak_width_cells(width_m)
+        if width_cells.ndim == 0:
+            firebreak_mask = firebreak_rings(burning, [int(width_cells)], shape, blocked)[0]
+        else:
+            # ความกว้างต่อเซลล์: 1 distance transform ต่อความกว้างที่ต่างกันของเซลล์ไหม้
+            firebreak_mask = np.zeros_like(burning)
+            for w in np.unique(width_cells[burning]):
+                firebreak_mask |= firebreak_rings(
+                    burning & (width_cells == w), [int(w)], shape, blocked
+                )[0]
 
         # อัปเดต state
         self.state[firebreak_mask] = FIREBREAK
-
         return firebreak_mask
 
 
@@ -1,4 +1,5 @@
 import os
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -20,6 +21,37 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def warm_up_gee():
+    """
+    เริ่ม ee.Initialize เบื้องหลังตอน startup → API รับ request ได้ทันที
+    (ปิดได้ด้วย GEE_WARMUP=0; ถ้า warm-up พัง request แรกที่ใช้ GEE จะ init ใหม่เอง)
+    worker ของ process pool ถูก spawn ล่วงหน้าและ init GEE เองผ่าน initializer
+    """
+    from services.executor_service import GEE_WARMUP, start_process_pool
+
+    if not GEE_WARMUP:
+        return
+
+    def _init():
+        from fire_simulator import init_gee
+
+        try:
+            init_gee()
+        except Exception as e:
+            print(f"⚠️ GEE warm-up failed: {e}")
+
+    threading.Thread(target=_init, name="gee-warmup", daemon=True).start()
+    start_process_pool()
+
+
+@app.on_event("shutdown")
+def stop_process_pool():
+    from services.executor_service import shutdown_process_pool
+
+    shutdown_process_pool()
+
+
 @app.get("/")
 def root():
     return {"status": "API is running"}
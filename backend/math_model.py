@@ -1,9 +1,14 @@
+import time
 from pyomo.environ import *
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 
-def run_math_model(zones: dict, centers: List[Dict[str, Any]] = None) -> dict:
+def run_math_model(
+    zones: dict, centers: List[Dict[str, Any]] = None, deadline: Optional[float] = None
+) -> dict:
     """
+    deadline: เวลา (time.time()) ที่ต้องเสร็จ → เป็น time_limit ของ HiGHS ทุกรอบ solve
+    (solve ที่รันอยู่ใน worker ไม่ถูกยกเลิกด้วย asyncio timeout) ; เกิน → TimeoutError
     zones = {
         "A": area_A,
         "B": area_B,
@@ -183,16 +188,34 @@ def run_math_model(zones: dict, centers: List[Dict[str, Any]] = None) -> dict:
 
     solver = SolverFactory("highs")
 
+    def solve() -> None:
+        options = {}
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError("Optimization exceeded its time limit")
+            options["time_limit"] = remaining
+        started = time.time()
+        try:
+            results = solver.solve(model, options=options)
+        except Exception:
+            # ครบ time_limit ก่อนเจอคำตอบที่ feasible → pyomo โหลดผลไม่ได้
+            if deadline is not None and time.time() - started >= 0.99 * options["time_limit"]:
+                raise TimeoutError("Optimization exceeded its time limit")
+            raise
+        if results.solver.termination_condition == TerminationCondition.maxTimeLimit:
+            raise TimeoutError("Optimization exceeded its time limit")
+
     # Step 1: Min Z1
     model.obj1 = Objective(expr=model.Z1, sense=minimize)
-    solver.solve(model)
+    solve()
     Z1_opt = value(model.Z1)
     Z2_at_Z1 = value(model.Z2)
     model.obj1.deactivate()
 
     # Step 2: Min Z2
     model.obj2 = Objective(expr=model.Z2, sense=minimize)
-    solver.solve(model)
+    solve()
     Z2_opt = value(model.Z2)
     Z1_at_Z2 = value(model.Z1)
     model.obj2.deactivate()
@@ -205,7 +228,7 @@ def run_math_model(zones: dict, centers: List[Dict[str, Any]] = None) -> dict:
     )
 
     model.obj = Objective(expr=model.Z, sense=minimize)
-    solver.solve(model)
+    solve()
 
     # =====================
     # Result
@@ -0,0 +1,312 @@
+import asyncio
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fire_simulator import BURNED, BURNING, landcover_to_codes
+from services.environment_service import prepare_simulator, use_compact_grids
+from services.executor_service import SIM_TASK_TIMEOUT_S, get_process_pool, run_in_process
+from services.patch_service import get_patch_provider
+from services.raster_service import ARRIVAL_NODATA, encode_grid, seconds_to_minutes
+from services.wind_service import fetch_wind_from_api_for_date
+from store.patch_cache import PATCH_LAYERS
+from store.shared_grid import SharedGrids, attach_grids
+
+ARRIVAL_PERCENTILES = (10, 50, 90)
+# วิธีส่ง environment ให้ worker: "shm" (shared memory) | "memmap" (ไฟล์ .npy)
+SHARED_GRID_BACKEND = os.getenv("SHARED_GRID_BACKEND", "shm")
+
+
+def sample_members(
+    n_members: int,
+    wind_min: float,
+    wind_max: float,
+    wind_dir: float,
+    dir_spread_deg: float = 15.0,
+    seed: Optional[int] = None,
+) -> List[Tuple[float, float]]:
+    """
+    สุ่ม (wind_speed, wind_dir) ของแต่ละ member
+    - ความเร็ว: triangular บนช่วง fuzzy (min, mid, max) → จุดยอดตรงกับ fuzzy_wind
+    - ทิศ: normal รอบ wind_dir ด้วย sd = dir_spread_deg
+    """
+    rng = np.random.default_rng(seed)
+    mid = (wind_min + wind_max) / 2.0
+    if wind_max > wind_min:
+        speeds = rng.triangular(wind_min, mid, wind_max, n_members)
+    else:
+        speeds = np.full(n_members, mid)
+    dirs = (wind_dir + rng.normal(0.0, dir_spread_deg, n_members)) % 360.0
+    return [(float(s), float(d)) for s, d in zip(speeds, dirs)]
+
+
+def run_member(
+    cfg: dict,
+    env: Any,
+    wind_speed: float,
+    wind_dir: float,
+    ndvi_sigma: float = 0.0,
+    lst_sigma: float = 0.0,
+    seed: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    รัน 1 member บน environment ที่ดึงมาแล้ว (ไม่ดึง GEE ซ้ำ)
+    - env: tuple ของ layer หรือ handle ของ SharedGrids (worker เปิดแบบไม่ copy)
+    - deadline: epoch seconds; เกินเวลาระหว่างจำลอง → TimeoutError
+    คืน (burned_mask, ignition_time) ของ member นั้น
+    """
+    if isinstance(env, dict):
+        grids = attach_grids(env)
+        env = tuple(grids[name] for name in PATCH_LAYERS)
+    slope, ndvi, lst, landcover = env
+    perturbed = ndvi_sigma > 0 or lst_sigma > 0
+    if perturbed:
+        rng = np.random.default_rng(seed)
+        ndvi = ndvi + rng.normal(0.0, ndvi_sigma, ndvi.shape) if ndvi_sigma > 0 else ndvi
+        lst = lst + rng.normal(0.0, lst_sigma, lst.shape) if lst_sigma > 0 else lst
+
+    def member_env(*args, **kwargs):
+        # เก็บลง env cache → copy ออกจาก shared memory ไม่ให้ต้นแบบค้าง attachment ของ handle เก่า
+        layers = (slope, ndvi, lst, landcover)
+        return layers if perturbed else tuple(np.array(a) for a in layers)
+
+    # ไม่ perturb → environment เดียวกับ incident: ใช้ต้นแบบใน env cache ของ worker
+    # (Rothermel base terms คำนวณครั้งเดียวต่อ worker ไม่ใช่ต่อ member ; เปลี่ยนลมคิดแค่ ros_for_wind)
+    sim = prepare_simulator(
+        cfg, wind_speed, wind_dir, patch_provider=member_env, cached=not perturbed
+    )
+
+    def check_deadline(current: int, total: int) -> None:
+        if time.time() > deadline:
+            raise TimeoutError("Ensemble member exceeded its time limit")
+
+    sim.run_simulation(show_progress=False, progress_cb=None if deadline is None else check_deadline)
+
+    burned = (sim.state == BURNING) | (sim.state == BURNED)
+    return burned, sim.ignition_time
+
+
+class EnsembleAggregator:
+    """
+    รวมผลแบบ streaming ด้วย order statistics ต่อเซลล์ (uint16 หน่วย res_s วินาที)
+    - percentile q ของ n member = ค่าลำดับที่ k = ceil(q·n/100) (member ที่ไม่ไหม้นับเป็น ∞)
+    - เก็บเฉพาะค่าที่ต้องใช้: k น้อยสุดจากฝั่งน้อย หรือ (b - k + 1) มากสุดในบรรดา b member ที่ไหม้
+      → หน่วยความจำ O(กริด × min(k, n - k + 1)) ไม่ขึ้นกับความยาวการจำลอง ไม่มี array ชั่วคราวขนาดกริด × bin
+    - อัปเดตเฉพาะเซลล์ที่ไหม้ใน member นั้น
+    """
+
+    def __init__(
+        self,
+        grid_y: int,
+        grid_x: int,
+        sim_time: float,
+        n_members: int,
+        percentiles: Sequence[float] = ARRIVAL_PERCENTILES,
+    ):
+        self.n_expected = int(n_members)
+        self.n_members = 0
+        self.res_s = max(1, math.ceil(float(sim_time) / (ARRIVAL_NODATA - 1)))
+        self.burn_count = np.zeros((grid_y, grid_x), dtype=np.uint32)
+
+        # q → ("low", index ในฝั่งน้อย) | ("high", k) อ่านจากฝั่งมาก
+        self._rank: Dict[float, Tuple[str, int]] = {}
+        n_low = n_high = 0
+        for q in percentiles:
+            k = max(1, math.ceil(q / 100.0 * self.n_expected))
+            if k <= self.n_expected - k + 1:
+                self._rank[q] = ("low", k)
+                n_low = max(n_low, k)
+            else:
+                self._rank[q] = ("high", k)
+                n_high = max(n_high, self.n_expected - k + 1)
+        # low: เรียงน้อย→มาก (ว่าง = NODATA) ; high: เรียงมาก→น้อย (ว่าง = 0)
+        self.low = np.full((grid_y * grid_x, n_low), ARRIVAL_NODATA, dtype=np.uint16)
+        self.high = np.zeros((grid_y * grid_x, n_high), dtype=np.uint16)
+
+    def add(self, burned: np.ndarray, ignition_time: np.ndarray) -> None:
+        if self.n_members >= self.n_expected:
+            raise ValueError(f"Aggregator expects {self.n_expected} members")
+        self.n_members += 1
+        self.burn_count += burned
+        idx = np.flatnonzero(burned)
+        t = np.asarray(ignition_time, dtype=np.float64).ravel()[idx]
+        x = np.minimum(np.ceil(t / self.res_s), ARRIVAL_NODATA - 1).astype(np.uint16)
+
+        # แทรกลงแถวที่เรียงอยู่แล้ว: ไล่คอลัมน์ เก็บค่าที่ควรอยู่ แล้วส่งอีกค่าไปคอลัมน์ถัดไป
+        carry = x
+        for c in range(self.low.shape[1]):
+            col = self.low[idx, c]
+            self.low[idx, c] = np.minimum(col, carry)
+            carry = np.maximum(col, carry)
+        carry = x
+        for c in range(self.high.shape[1]):
+            col = self.high[idx, c]
+            self.high[idx, c] = np.maximum(col, carry)
+            carry = np.minimum(col, carry)
+
+    def burn_probability(self) -> np.ndarray:
+        return self.burn_count / max(1, self.n_members)
+
+    def arrival_percentile(self, q: float) -> np.ndarray:
+        """
+        เวลา (วินาที) ที่ไฟมาถึงเซลล์ใน q% ของ member (นับ member ที่ไม่ไหม้เป็น ∞)
+        → NaN ถ้าโอกาสไหม้ < q%
+        """
+        side, k = self._rank[q]
+        b = self.burn_count.ravel().astype(np.int64)
+        reached = b >= k
+        if side == "low":
+            val = self.low[:, k - 1]
+        else:
+            # ลำดับที่ k จากน้อย ในบรรดา b ค่า = ลำดับที่ b - k + 1 จากมาก
+            col = np.clip(b - k, 0, self.high.shape[1] - 1)
+            val = np.take_along_axis(self.high, col[:, None], axis=1)[:, 0]
+        out = val.astype(np.float64) * self.res_s
+        out[~reached] = np.nan
+        return out.reshape(self.burn_count.shape)
+
+    def nbytes(self) -> int:
+        return int(self.low.nbytes + self.high.nbytes + self.burn_count.nbytes)
+
+
+def _ensemble_inputs(cfg: dict) -> Tuple[Tuple[float, float, float], Tuple[np.ndarray, ...]]:
+    """ลม fuzzy (min, max, dir) + environment ของ incident (GEE / cache) — งาน I/O"""
+    wind = fetch_wind_from_api_for_date(
+        lat=cfg["lat"],
+        lon=cfg["lon"],
+        year=cfg["year"],
+        month=cfg["month"],
+        day=cfg["day"],
+    )
+    slope, ndvi, lst, landcover = get_patch_provider()(
+        cfg["lat"],
+        cfg["lon"],
+        cfg["month"],
+        cfg["grid_x"],
+        cfg["grid_y"],
+        cfg["cell_size"],
+    )
+    real = np.float32 if use_compact_grids(cfg) else np.float64
+    env = (
+        np.asarray(slope, dtype=real),
+        np.asarray(ndvi, dtype=real),
+        np.asarray(lst, dtype=real),
+        landcover_to_codes(landcover),
+    )
+    return wind, env
+
+
+def _percentile_minutes(agg: EnsembleAggregator, q: float) -> np.ndarray:
+    seconds = agg.arrival_percentile(q)
+    return seconds_to_minutes(seconds, ~np.isnan(seconds))
+
+
+def _summarize_ensemble(
+    cfg: dict,
+    agg: EnsembleAggregator,
+    wind: Tuple[float, float, float],
+    members: List[Tuple[float, float]],
+    encoding: str = "png",
+) -> Dict[str, Any]:
+    """
+    สรุปผล ensemble ; กริดส่งแบบบีบอัด (encode_grid) แทน JSON list ทั้งกริด
+    - burn_probability: จำนวน member ที่ไหม้ (uint16) × scale = โอกาสไหม้
+    - arrival_min: เวลาไฟมาถึงต่อ percentile (uint16 นาที, โอกาสไหม้ < q% → nodata)
+    """
+    wind_min, wind_max, wind_dir = wind
+    cell_area = float(cfg["cell_size"]) ** 2
+    prob = agg.burn_probability()
+    speeds = [s for s, _ in members]
+
+    return {
+        "n_members": agg.n_members,
+        "wind": {
+            "speed_min": round(wind_min, 3),
+            "speed_max": round(wind_max, 3),
+            "direction": round(wind_dir, 1),
+            "sampled_speed_mean": round(float(np.mean(speeds)), 3),
+        },
+        "expected_burned_area_m2": round(float(prob.sum()) * cell_area, 1),
+        "area_by_probability_m2": {
+            f"p>={p}": float((prob >= p / 100.0).sum()) * cell_area
+            for p in (10, 50, 90)
+        },
+        "shape": [int(cfg["grid_y"]), int(cfg["grid_x"])],
+        "burn_probability": {
+            **encode_grid(agg.burn_count.astype(np.uint16), encoding),
+            "scale": 1.0 / max(1, agg.n_members),
+        },
+        "arrival_min": {
+            f"p{q}": {
+                **encode_grid(_percentile_minutes(agg, q), encoding),
+                "nodata": ARRIVAL_NODATA,
+            }
+            for q in ARRIVAL_PERCENTILES
+        },
+        "arrival_bin_s": agg.res_s,
+    }
+
+
+async def run_ensemble(
+    cfg: dict,
+    n_members: int = 20,
+    seed: Optional[int] = None,
+    dir_spread_deg: float = 15.0,
+    ndvi_sigma: float = 0.0,
+    lst_sigma: float = 0.0,
+    deadline: Optional[float] = None,
+    encoding: str = "png",
+) -> Dict[str, Any]:
+    """
+    Monte-Carlo ensemble บนช่วงลม fuzzy (wind_min, wind_max)
+    - ดึงลม + environment (GEE / cache) ครั้งเดียว ใช้ร่วมกันทุก member
+    - member กระจายไปที่ process pool ผ่าน run_in_process แล้วรวมผลทันทีที่แต่ละตัวเสร็จ
+    - deadline: epoch seconds (ค่าเริ่มต้น SIM_TASK_TIMEOUT_S จากตอนเรียก) ; เกิน → TimeoutError
+    - encoding: รูปแบบกริดในผลลัพธ์ (RASTER_ENCODINGS)
+    """
+    if deadline is None:
+        deadline = time.time() + SIM_TASK_TIMEOUT_S
+    wind, env = await asyncio.to_thread(_ensemble_inputs, cfg)
+
+    members = sample_members(n_members, *wind, dir_spread_deg, seed)
+    member_seeds = np.random.SeedSequence(seed).generate_state(n_members)
+    agg = EnsembleAggregator(cfg["grid_y"], cfg["grid_x"], cfg["sim_minutes"] * 60, n_members)
+
+    def submit(env_arg: Any, k: int) -> "asyncio.Future":
+        speed, direction = members[k]
+        return asyncio.ensure_future(
+            run_in_process(
+                run_member,
+                cfg,
+                env_arg,
+                speed,
+                direction,
+                ndvi_sigma,
+                lst_sigma,
+                int(member_seeds[k]),
+                deadline,
+                timeout=max(0.0, deadline - time.time()),
+            )
+        )
+
+    if get_process_pool() is None:
+        for k in range(n_members):
+            agg.add(*await submit(env, k))
+    else:
+        # environment ชุดเดียวใน shared memory → worker ทุกตัวอ่านร่วมกัน ไม่ pickle ต่อ member
+        with SharedGrids.create(
+            dict(zip(PATCH_LAYERS, env)), backend=SHARED_GRID_BACKEND
+        ) as shared:
+            futures = [submit(shared.handle, k) for k in range(n_members)]
+            try:
+                for fut in asyncio.as_completed(futures):
+                    agg.add(*await fut)
+            finally:
+                for fut in futures:
+                    fut.cancel()
+
+    return await asyncio.to_thread(_summarize_ensemble, cfg, agg, wind, members, encoding)
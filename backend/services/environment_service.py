@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from fire_simulator import ENGINES, IntegratedRothermelFireSimulator
+from services.patch_service import get_patch_provider, patch_cache_stats
+from store.env_cache import EnvironmentCache
+
+# ขนาด cache ของ environment ที่เตรียมแล้วต่อ process (MB) ; 0 → ปิด
+ENV_CACHE_MAX_MB = float(os.getenv("ENV_CACHE_MAX_MB", "128"))
+# กริดตั้งแต่กี่เซลล์ขึ้นไปใช้ compact mode อัตโนมัติ (uint8 / float32) ; 0 → ไม่ใช้อัตโนมัติ
+SIM_COMPACT_CELLS = int(os.getenv("SIM_COMPACT_CELLS", "250000"))
+# kernel ของ CA step: "auto" (numba ถ้าติดตั้งไว้) | "numba" | "python" (reference)
+SIM_KERNEL = os.getenv("SIM_KERNEL", "auto")
+# พิมพ์สถิติ cache ของ process (รวม worker ใน process pool) ทุก ๆ กี่วินาที ; 0 → ปิด
+CACHE_STATS_LOG_S = float(os.getenv("CACHE_STATS_LOG_S", "300"))
+
+_cache: Optional[EnvironmentCache] = None
+_cache_lock = threading.Lock()
+_stats_logged_at = 0.0
+
+
+def get_env_cache() -> Optional[EnvironmentCache]:
+    global _cache
+    if ENV_CACHE_MAX_MB <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EnvironmentCache(max_bytes=int(ENV_CACHE_MAX_MB * 1024 * 1024))
+    return _cache
+
+
+def cache_stats() -> Dict[str, Any]:
+    """สถิติ env cache + patch / tile cache ของ process นี้ (cache แยกต่อ process)"""
+    cache = get_env_cache()
+    return {
+        "pid": os.getpid(),
+        "env": cache.stats() if cache is not None else None,
+        **patch_cache_stats(),
+    }
+
+
+def log_cache_stats() -> None:
+    """พิมพ์ cache_stats() ไม่เกิน 1 ครั้งต่อ CACHE_STATS_LOG_S (เรียกหลังเตรียม simulator)"""
+    global _stats_logged_at
+    if CACHE_STATS_LOG_S <= 0:
+        return
+    with _cache_lock:
+        now = time.time()
+        if now - _stats_logged_at < CACHE_STATS_LOG_S:
+            return
+        _stats_logged_at = now
+    print(f"📊 cache stats {json.dumps(cache_stats())}", flush=True)
+
+
+def use_compact_grids(cfg: dict) -> bool:
+    """cfg["compact"] ถ้าระบุ ไม่งั้นเปิดเองเมื่อกริดใหญ่ถึง SIM_COMPACT_CELLS"""
+    if cfg.get("compact") is not None:
+        return bool(cfg["compact"])
+    cells = int(cfg["grid_x"]) * int(cfg["grid_y"])
+    return SIM_COMPACT_CELLS > 0 and cells >= SIM_COMPACT_CELLS
+
+
+def sim_kernel(cfg: dict) -> str:
+    return cfg.get("kernel") or SIM_KERNEL
+
+
+def environment_key(cfg: dict) -> tuple:
+    return (
+        round(float(cfg["lat"]), 6),
+        round(float(cfg["lon"]), 6),
+        int(cfg["month"]),
+        int(cfg["grid_x"]),
+        int(cfg["grid_y"]),
+        float(cfg["cell_size"]),
+        use_compact_grids(cfg),
+    )
+
+
+def prepare_simulator(
+    cfg: dict,
+    wind_speed: float,
+    wind_dir: float,
+    wind_schedule: Optional[List[Tuple[float, float, float]]] = None,
+    patch_provider: Optional[Callable[..., Tuple[np.ndarray, ...]]] = None,
+    cached: bool = True,
+) -> IntegratedRothermelFireSimulator:
+    """
+    simulator พร้อมรันสำหรับ cfg
+    - hit: clone จากต้นแบบใน cache (ข้าม patch fetch, fuel_mask, landcover, Rothermel)
+    - miss: สร้างต้นแบบใหม่ เก็บไว้ แล้ว clone
+    - ลมไม่อยู่ใน key: ต้นแบบเก็บ ros_terms ไว้ → เปลี่ยนลมคิดแค่ apply_wind_slope
+    - patch_provider: แทน get_patch_provider() (เช่น environment ที่ ensemble ส่งมา)
+    - cached=False: ไม่อ่าน / ไม่เก็บ cache (environment ถูก perturb) → คืนตัวที่สร้างเลย ไม่ clone
+    """
+    engine = cfg.get("engine", "auto")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+
+    cache = get_env_cache() if cached else None
+    key = environment_key(cfg)
+    sim = cache.get(key) if cache is not None else None
+
+    if sim is None:
+        sim = IntegratedRothermelFireSimulator(
+            lat=cfg["lat"],
+            lon=cfg["lon"],
+            month=cfg["month"],
+            wind_speed=wind_speed,
+            wind_dir=wind_dir,
+            grid_x=cfg["grid_x"],
+            grid_y=cfg["grid_y"],
+            cell_size=cfg["cell_size"],
+            sim_minutes=cfg["sim_minutes"],
+            patch_provider=patch_provider or get_patch_provider(),
+            wind_schedule=None if cached else wind_schedule,
+            compact=use_compact_grids(cfg),
+        )
+        if cache is not None:
+            cache.put(key, sim, sim.nbytes())
+
+    if cached:
+        sim = sim.clone(wind_speed, wind_dir, wind_schedule or [])
+    sim.sim_time = int(cfg["sim_minutes"] * 60)
+    sim.engine = engine
+    sim.set_kernel(sim_kernel(cfg))
+    log_cache_stats()
+    return sim
@@ -0,0 +1,98 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.managers import SyncManager
+from typing import Any, Callable, Optional
+
+# จำนวน worker process (ค่าเริ่มต้น = จำนวนคอร์) ; 0 → รันใน threadpool ของ uvicorn แบบเดิม
+SIM_PROCESS_WORKERS = int(os.getenv("SIM_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+# timeout ต่องาน (วินาที)
+SIM_TASK_TIMEOUT_S = float(os.getenv("SIM_TASK_TIMEOUT_S", "300"))
+
+# init GEE ใน worker ตั้งแต่ตอนเกิด (ค่าเดียวกับ warm-up ของ API ใน main.py) ; "0" → ปิด
+GEE_WARMUP = os.getenv("GEE_WARMUP", "1") != "0"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_manager: Optional[SyncManager] = None
+
+
+def _warm_up_worker() -> None:
+    """initializer ของ worker: ee.Initialize เบื้องหลัง (พัง → งานแรกที่ใช้ GEE จะ init ใหม่เอง)"""
+
+    def _init():
+        from fire_simulator import init_gee
+
+        try:
+            init_gee()
+        except Exception as e:
+            print(f"⚠️ GEE warm-up failed (worker {os.getpid()}): {e}", flush=True)
+
+    threading.Thread(target=_init, name="gee-warmup", daemon=True).start()
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    ProcessPoolExecutor ที่ใช้ร่วมกันทั้ง API (สร้างเมื่อใช้ครั้งแรก)
+    ใช้ spawn เพื่อไม่ fork ตามหลัง thread ของ uvicorn / GEE warm-up
+    """
+    global _pool
+    if SIM_PROCESS_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=SIM_PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up_worker if GEE_WARMUP else None,
+            )
+    return _pool
+
+
+def start_process_pool() -> None:
+    """spawn worker ครบทุกตัวล่วงหน้า (ตอน startup) → initializer ทำงานก่อน request แรก"""
+    pool = get_process_pool()
+    if pool is not None:
+        for _ in range(SIM_PROCESS_WORKERS):
+            pool.submit(os.getpid)
+
+
+def get_manager() -> SyncManager:
+    """Manager ที่ใช้ร่วมกัน (Queue ส่งความคืบหน้า / delta จาก worker กลับมา API)"""
+    global _manager
+    with _pool_lock:
+        if _manager is None:
+            _manager = multiprocessing.get_context("spawn").Manager()
+    return _manager
+
+
+def shutdown_process_pool() -> None:
+    global _pool, _manager
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
+
+
+async def run_in_process(
+    fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None
+) -> Any:
+    """
+    รัน fn(*args) ใน process pool โดยไม่บล็อก event loop
+    - timeout (ค่าเริ่มต้น SIM_TASK_TIMEOUT_S): เกินเวลา → asyncio.TimeoutError
+    - ถูกยกเลิก / timeout ขณะยังรออยู่ในคิว → งานถูกถอนออกจากคิว ไม่ได้รัน
+      (งานที่รันอยู่แล้วควรเช็ก deadline เอง เช่น run_fire_model(deadline=...))
+    """
+    timeout = SIM_TASK_TIMEOUT_S if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(get_process_pool(), fn, *args)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        future.cancel()
+        raise
@@ -1,41 +1,345 @@
+import time
 import numpy as np
-from fire_simulator import IntegratedRothermelFireSimulator, FIREBREAK
-from services.wind_service import fetch_wind_from_api_for_date, fuzzy_wind
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from fire_simulator import (
+    IntegratedRothermelFireSimulator,
+    FIREBREAK,
+    snapshot_from_bytes,
+    snapshot_to_bytes,
+)
+from services.wind_service import (
+    fetch_wind_from_api_for_date,
+    fetch_wind_schedule_for_date,
+    fuzzy_wind,
+)
+from services.environment_service import prepare_simulator
+from services.raster_service import encode_rasters
 
 UNBURNED = 0
 BURNING = 1
 BURNED = 2
 
 
-def run_fire_model(cfg: dict) -> dict:
-    # 🌬 ดึงลมจาก API ตามวันที่
-    wind_min, wind_max, wind_dir = fetch_wind_from_api_for_date(
+def _hourly_wind_schedule(cfg: dict, sim_minutes: float) -> List[Tuple[float, float, float]]:
+    """ตารางลมรายชั่วโมงที่ครอบคลุม sim_minutes → [(t วินาที, wind_speed, wind_dir), ...]"""
+    hourly = fetch_wind_schedule_for_date(
         lat=cfg["lat"],
         lon=cfg["lon"],
         year=cfg["year"],
         month=cfg["month"],
         day=cfg["day"],
+        sim_minutes=sim_minutes,
     )
+    return [(t, fuzzy_wind(lo, hi), d) for t, lo, hi, d in hourly]
+
 
-    wind_speed = fuzzy_wind(wind_min, wind_max)
+def _fetch_wind(cfg: dict) -> Tuple[float, float, Optional[list]]:
+    """🌬 ดึงลมจาก API ตามวันที่ (hourly_wind → ลมเปลี่ยนทุกชั่วโมงตลอดการจำลอง)"""
+    if cfg.get("hourly_wind", False):
+        wind_schedule = _hourly_wind_schedule(cfg, cfg["sim_minutes"])
+        _, wind_speed, wind_dir = wind_schedule[0]
+        return wind_speed, wind_dir, wind_schedule
 
-    # 🔥 Initialize simulator
-    sim = IntegratedRothermelFireSimulator(
+    wind_min, wind_max, wind_dir = fetch_wind_from_api_for_date(
         lat=cfg["lat"],
         lon=cfg["lon"],
+        year=cfg["year"],
         month=cfg["month"],
-        wind_speed=wind_speed,
-        wind_dir=wind_dir,
-        grid_x=cfg["grid_x"],
-        grid_y=cfg["grid_y"],
-        cell_size=cfg["cell_size"],
-        sim_minutes=cfg["sim_minutes"],
+        day=cfg["day"],
     )
+    return fuzzy_wind(wind_min, wind_max), wind_dir, None
+
+
+def _ignition(cfg: dict) -> Optional[Tuple[int, int]]:
+    if cfg.get("ignition_row") is None or cfg.get("ignition_col") is None:
+        return None
+    return int(cfg["ignition_row"]), int(cfg["ignition_col"])
+
+
+def _with_deadline(
+    progress_cb: Optional[Callable[[int, int], None]], deadline: Optional[float]
+) -> Optional[Callable[[int, int], None]]:
+    """deadline: epoch seconds; เกินเวลาระหว่างจำลอง → TimeoutError (ยกเลิกแบบ cooperative)"""
+    if deadline is None:
+        return progress_cb
+
+    def checked_cb(current: int, total: int) -> None:
+        if time.time() > deadline:
+            raise TimeoutError("Simulation exceeded its time limit")
+        if progress_cb is not None:
+            progress_cb(current, total)
+
+    return checked_cb
+
+
+def _with_front(
+    sim: IntegratedRothermelFireSimulator,
+    progress_cb: Optional[Callable[[int, int], None]],
+    front_cb: Optional[Callable[[Dict[str, Any]], None]],
+    every_s: float,
+) -> Tuple[Optional[Callable[[int, int], None]], Callable[[], None]]:
+    """
+    front_cb(delta): เซลล์ที่จุดติด / มอดใหม่ (flat index) ทุก every_s วินาทีจำลอง ระหว่างรัน
+    คืน (progress_cb ที่ห่อแล้ว, flush) ; flush ส่ง delta ที่เหลือหลังจบการจำลอง
+    """
+    if front_cb is None:
+        return progress_cb, lambda: None
+
+    cursor = (0, 0)  # sim เพิ่ง reset → frame แรกมีจุดตั้งต้นด้วย
+    last_t = -np.inf
+    seq = 0
+
+    def emit(t_s: float) -> None:
+        nonlocal cursor, last_t, seq
+        ignited, burned, cursor = sim.front_delta(cursor)
+        last_t = t_s
+        if ignited.size == 0 and burned.size == 0:
+            return
+        front_cb(
+            {
+                "seq": seq,
+                "t_s": int(t_s),
+                "ignited": ignited.tolist(),
+                "ignited_t_s": np.rint(sim.ignition_time.ravel()[ignited]).astype(np.int64).tolist(),
+                "burned": burned.tolist(),
+            }
+        )
+        seq += 1
+
+    def front_progress(current: int, total: int) -> None:
+        t_s = (current - 1) * sim.dt  # เวลาจำลองของ step นี้ (รันจาก t=0)
+        if t_s - last_t >= every_s:
+            emit(t_s)
+        if progress_cb is not None:
+            progress_cb(current, total)
+
+    return front_progress, lambda: emit(sim.elapsed_s)
+
+
+def run_fire_model(
+    cfg: dict,
+    progress_cb: Optional[Callable[[int, int], None]] = None,
+    deadline: Optional[float] = None,
+    front_cb: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> dict:
+    """
+    - progress_cb(current_step, total_steps): รายงานความคืบหน้า
+    - deadline: epoch seconds; เกินเวลาระหว่างจำลอง → TimeoutError (ยกเลิกแบบ cooperative)
+    - cfg["raster"]: "png" | "zlib" | "rle" → แนบ raster เวลาไฟมาถึง + state (+ cfg["isochrones_min"])
+    - front_cb(delta): stream แนวไฟระหว่างรัน ทุก cfg["front_every_s"] วินาทีจำลอง (ค่าเริ่มต้น = ทุก step)
+    """
+    progress_cb = _with_deadline(progress_cb, deadline)
+    wind_speed, wind_dir, wind_schedule = _fetch_wind(cfg)
+
+    # 🔥 Initialize simulator (environment ที่เตรียมแล้วมาจาก cache ถ้ามี)
+    sim = prepare_simulator(cfg, wind_speed, wind_dir, wind_schedule)
+    ignition = _ignition(cfg)
+    if ignition is not None:
+        sim.reset(ignition=ignition)
 
     # ▶️ Run simulation
-    sim.run_simulation(show_progress=False)
-    sim.mark_firebreak(width_m=8.0)
+    progress_cb, flush_front = _with_front(
+        sim, progress_cb, front_cb, cfg.get("front_every_s") or sim.dt
+    )
+    sim.run_simulation(show_progress=False, progress_cb=progress_cb)
+    flush_front()
+    sim.mark_firebreak(
+        width_m=cfg.get("firebreak_width_m", 8.0),
+        shape=cfg.get("firebreak_shape", "square"),
+    )
+
+    result = summarize_simulation(sim, wind_speed, wind_dir, wind_schedule)
+    if cfg.get("raster"):
+        result["rasters"] = encode_rasters(sim, cfg["raster"], cfg.get("isochrones_min"))
+    return result
+
+
+def run_fire_scenarios(
+    cfg: dict, scenarios: List[dict], deadline: Optional[float] = None
+) -> dict:
+    """
+    What-if หลาย scenario บน incident เดียว: โหลด environment + ROS ครั้งเดียว
+    แล้ว sim.reset(...) ก่อนรันแต่ละ scenario (ไม่ดึง GEE / ไม่คำนวณ Rothermel ซ้ำ)
+    - scenario: ignition_row / ignition_col / sim_minutes / firebreak_width_m /
+      wind_speed / wind_dir (ระบุลม → ลมคงที่ตลอด scenario นั้น)
+    """
+    progress_cb = _with_deadline(None, deadline)
+    wind_speed, wind_dir, wind_schedule = _fetch_wind(cfg)
 
+    t0 = time.time()
+    sim = prepare_simulator(cfg, wind_speed, wind_dir, wind_schedule)
+    load_s = time.time() - t0
+
+    results = []
+    for scenario in scenarios:
+        t1 = time.time()
+        speed, direction = scenario.get("wind_speed"), scenario.get("wind_dir")
+        if speed is None and direction is None:
+            s_speed, s_dir, s_schedule = wind_speed, wind_dir, wind_schedule
+        else:
+            s_speed = wind_speed if speed is None else speed
+            s_dir = wind_dir if direction is None else direction
+            s_schedule = None
+        sim.reset(
+            ignition=_ignition(scenario),
+            sim_minutes=scenario.get("sim_minutes") or cfg["sim_minutes"],
+            wind_speed=s_speed,
+            wind_dir=s_dir,
+            wind_schedule=s_schedule or [],
+        )
+        sim.run_simulation(show_progress=False, progress_cb=progress_cb)
+        width_m = scenario.get("firebreak_width_m")
+        sim.mark_firebreak(
+            width_m=cfg.get("firebreak_width_m", 8.0) if width_m is None else width_m,
+            shape=cfg.get("firebreak_shape", "square"),
+        )
+        result = summarize_simulation(sim, s_speed, s_dir, s_schedule)
+        result["run_time_s"] = round(time.time() - t1, 4)
+        results.append(result)
+
+    return {"environment_load_s": round(load_s, 4), "scenarios": results}
+
+
+def advance_simulation(
+    cfg: dict,
+    snapshot: Optional[bytes],
+    until_minutes: float,
+    wind: Optional[Tuple[float, float, Optional[list]]] = None,
+    wind_override: Optional[Tuple[Optional[float], Optional[float]]] = None,
+    deadline: Optional[float] = None,
+) -> dict:
+    """
+    เดินการจำลองต่อจาก snapshot ถึง until_minutes (ผลเท่ากับรันรวดเดียว)
+    - worker ไม่ต้องจำอะไร: environment มาจาก cache, state ทั้งหมดอยู่ใน snapshot (bytes)
+    - snapshot=None → เริ่มใหม่ที่ t=0 (ดึงลมถ้าไม่ส่ง wind มา)
+    - wind_override (speed, dir): ลมคงที่ตั้งแต่จุดนี้ไป (None → คงค่าปัจจุบัน)
+      ใช้กับ what-if ที่แตกกิ่งจาก prefix เดียวกัน
+    - hourly_wind: เดินเลยช่วงที่ตารางลมครอบคลุม (เดิมดึงแค่ sim_minutes) → ดึงชั่วโมงที่ขาดเพิ่ม
+    คืน {"wind", "snapshot", "result"}
+    """
+    progress_cb = _with_deadline(None, deadline)
+    wind_speed, wind_dir, wind_schedule = wind if wind is not None else _fetch_wind(cfg)
+
+    sim = prepare_simulator(cfg, wind_speed, wind_dir, wind_schedule)
+    if snapshot is not None:
+        sim.restore(snapshot_from_bytes(snapshot))
+    else:
+        ignition = _ignition(cfg)
+        if ignition is not None:
+            sim.reset(ignition=ignition)
+    if wind_override is not None:
+        speed, direction = wind_override
+        sim.wind_schedule = []
+        sim.set_wind(
+            sim.wind_speed if speed is None else speed,
+            sim.wind_dir if direction is None else direction,
+            t_now=sim.elapsed_s,
+        )
+
+    # ยังเดินตามตารางลมรายชั่วโมงอยู่ (ไม่ถูก override) แต่ตารางสั้นกว่า until → ต่อตาราง
+    if wind_schedule and sim.wind_schedule and until_minutes > len(wind_schedule) * 60:
+        wind_schedule = _hourly_wind_schedule(cfg, until_minutes)
+        sim.set_wind_schedule(wind_schedule)
+
+    sim.run_until(until_minutes * 60, progress_cb=progress_cb)
+    result = summarize_simulation(sim, sim.wind_speed, sim.wind_dir, wind_schedule)
+    result["elapsed_min"] = sim.elapsed_s / 60.0
+    return {
+        "wind": (wind_speed, wind_dir, wind_schedule),
+        "snapshot": snapshot_to_bytes(sim.snapshot()),
+        "result": result,
+    }
+
+
+def _burned_area_m2(sim: IntegratedRothermelFireSimulator) -> float:
+    burned = int(((sim.state == BURNING) | (sim.state == BURNED)).sum())
+    return burned * sim.cell_size**2
+
+
+def run_firebreak_optimization(
+    cfg: dict,
+    layouts: List[dict],
+    checkpoint_minutes: float,
+    deadline: Optional[float] = None,
+) -> dict:
+    """
+    เลือกแนวกันไฟจากการจำลองการกักไฟจริง
+    - รันถึง checkpoint_minutes ครั้งเดียว → fork ต่อ layout, ทำแนวกันไฟ (ไม่มีเชื้อเพลิง)
+      แล้วรันต่อถึง sim_minutes (ไม่รันซ้ำจาก t=0 / ไม่โหลด environment ซ้ำ)
+    - baseline = รันต่อโดยไม่มีแนวกันไฟ ; ไฟดับแล้วไม่ตั้งต้นใหม่ (reseed=False) ทั้งสองฝั่ง
+    - score = พื้นที่ที่รอดจากไฟ / ความยาวแนวกันไฟ (m² ต่อเมตร) → เลือกค่าสูงสุด
+    """
+    progress_cb = _with_deadline(None, deadline)
+    wind_speed, wind_dir, wind_schedule = _fetch_wind(cfg)
+
+    t0 = time.time()
+    sim = prepare_simulator(cfg, wind_speed, wind_dir, wind_schedule)
+    ignition = _ignition(cfg)
+    if ignition is not None:
+        sim.reset(ignition=ignition)
+
+    # checkpoint: รันถึงเวลาที่เริ่มทำแนวกันไฟ
+    end_s = sim.sim_time
+    checkpoint_t = int(min(end_s, checkpoint_minutes * 60))
+    sim.sim_time = checkpoint_t
+    sim.run_simulation(show_progress=False, progress_cb=progress_cb)
+    sim.sim_time = end_s
+    checkpoint_s = time.time() - t0
+
+    def run_from_checkpoint(mask: Optional[np.ndarray]) -> float:
+        branch = sim.fork()
+        branch.reseed = False
+        if mask is not None:
+            branch.state[mask] = FIREBREAK
+            branch.fuel_mask[mask] = 0
+        branch.run_simulation(show_progress=False, progress_cb=progress_cb)
+        return _burned_area_m2(branch)
+
+    baseline_m2 = run_from_checkpoint(None)
+    masks = sim.firebreak_layouts(layouts, shape=cfg.get("firebreak_shape", "square"))
+
+    candidates = []
+    for layout, mask in zip(layouts, masks):
+        t1 = time.time()
+        burned_m2 = run_from_checkpoint(mask)
+        # ความยาวแนว = พื้นที่แนว / ความกว้างที่สร้างจริง (จำนวนเซลล์ × cell_size)
+        width_cells = max(1, round(float(layout.get("width_m", 8.0)) / sim.cell_size))
+        length_m = float(mask.sum()) * sim.cell_size / width_cells
+        saved_m2 = baseline_m2 - burned_m2
+        candidates.append(
+            {
+                "distance_m": float(layout.get("distance_m", 0.0)),
+                "width_m": float(layout.get("width_m", 8.0)),
+                "arc_deg": float(layout.get("arc_deg", 360.0)),
+                "firebreak_cells": int(mask.sum()),
+                "break_length_m": round(length_m, 1),
+                "burned_area_m2": burned_m2,
+                "saved_area_m2": saved_m2,
+                "saved_m2_per_m": round(saved_m2 / length_m, 3) if length_m > 0 else 0.0,
+                "run_time_s": round(time.time() - t1, 4),
+            }
+        )
+
+    best = max(
+        candidates,
+        key=lambda c: (c["saved_m2_per_m"], -c["burned_area_m2"]),
+        default=None,
+    )
+    return {
+        "checkpoint_min": round(checkpoint_t / 60.0, 2),
+        "checkpoint_s": round(checkpoint_s, 4),
+        "baseline_burned_area_m2": baseline_m2,
+        "best": best,
+        "candidates": candidates,
+    }
+
+
+def summarize_simulation(
+    sim: IntegratedRothermelFireSimulator,
+    wind_speed: float,
+    wind_dir: float,
+    wind_schedule: Optional[list] = None,
+) -> dict:
     # =========================
     # 🔢 Count cells by state
     # =========================
@@ -73,9 +377,15 @@ def run_fire_model(cfg: dict) -> dict:
     # =========================
     # 📤 Final output
     # =========================
-    return {
+    result = {
         "wind_speed": round(wind_speed, 3),
         "wind_direction": round(wind_dir, 1),
         "ros": ros_stats,
         "summary": summary,
     }
+    if wind_schedule and len(wind_schedule) > 1:
+        result["wind_schedule"] = [
+            {"t_min": t / 60.0, "speed": round(ws, 3), "direction": round(wd, 1)}
+            for t, ws, wd in wind_schedule
+        ]
+    return result
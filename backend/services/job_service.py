@@ -0,0 +1,150 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from services.executor_service import get_manager, get_process_pool
+from services.fire_service import run_fire_model
+
+# จำนวน simulation ที่รันพร้อมกันได้ และอายุของ job ที่จบแล้วก่อนถูกลบ
+JOB_WORKERS = int(os.getenv("SIM_JOB_WORKERS", "2"))
+JOB_TTL_S = float(os.getenv("SIM_JOB_TTL_S", "3600"))
+# เวลาสูงสุดต่อ job (วินาที) ; เกิน → failed
+JOB_TIMEOUT_S = float(os.getenv("SIM_JOB_TIMEOUT_S", "1800"))
+# ส่ง progress จาก worker ห่างกันอย่างน้อยเท่านี้ (วินาที) ลด IPC ต่อ step
+PROGRESS_INTERVAL_S = 0.2
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class SimulationJob:
+    def __init__(self, cfg: dict, stream_front: bool = False):
+        self.job_id = uuid.uuid4().hex
+        self.cfg = cfg
+        # delta ของแนวไฟระหว่างรัน (worker append, SSE อ่านตาม seq) ; None → ไม่ได้ขอ stream
+        self.front: Optional[List[dict]] = [] if stream_front else None
+        self.status = QUEUED
+        self.current, self.total = 0, 0
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def update_progress(self, current: int, total: int) -> None:
+        self.current, self.total = current, total
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        percent = (100.0 * self.current / self.total) if self.total else 0.0
+        out = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "progress": {
+                "current_step": self.current,
+                "total_steps": self.total,
+                "percent": round(percent, 1),
+            },
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if include_result and self.status == DONE:
+            out["result"] = self.result
+        return out
+
+
+# thread ของ API แค่รอผล + รับข้อความจาก worker process (ไม่จำลองเอง → ไม่แย่ง GIL)
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="sim-job")
+_jobs: Dict[str, SimulationJob] = {}
+_lock = threading.Lock()
+
+
+def _run_job_in_worker(cfg: dict, messages: Any, deadline: float, stream_front: bool) -> dict:
+    """ฝั่ง worker process: ส่ง ("progress", current, total) / ("front", delta) ผ่าน Manager queue"""
+    last_sent = 0.0
+
+    def progress_cb(current: int, total: int) -> None:
+        nonlocal last_sent
+        now = time.monotonic()
+        if current == total or now - last_sent >= PROGRESS_INTERVAL_S:
+            last_sent = now
+            messages.put(("progress", current, total))
+
+    front_cb = (lambda delta: messages.put(("front", delta))) if stream_front else None
+    return run_fire_model(cfg, progress_cb=progress_cb, deadline=deadline, front_cb=front_cb)
+
+
+def _apply_message(job: SimulationJob, message: tuple) -> None:
+    if message[0] == "progress":
+        job.update_progress(message[1], message[2])
+    elif message[0] == "front" and job.front is not None:
+        job.front.append(message[1])
+
+
+def _run_job(job: SimulationJob) -> None:
+    job.status, job.started_at = RUNNING, time.time()
+    deadline = job.started_at + JOB_TIMEOUT_S
+    try:
+        pool = get_process_pool()
+        if pool is None:
+            front_cb = job.front.append if job.front is not None else None
+            job.result = run_fire_model(
+                job.cfg, progress_cb=job.update_progress, deadline=deadline, front_cb=front_cb
+            )
+        else:
+            messages = get_manager().Queue()
+            future = pool.submit(
+                _run_job_in_worker, job.cfg, messages, deadline, job.front is not None
+            )
+            while not future.done():
+                try:
+                    _apply_message(job, messages.get(timeout=PROGRESS_INTERVAL_S))
+                except queue.Empty:
+                    pass
+                if time.time() > deadline + 30.0:  # ค้างก่อนถึง simulation (เช่น GEE)
+                    future.cancel()
+                    raise TimeoutError("Simulation exceeded its time limit")
+            # worker put ครบก่อน return → ระบายที่เหลือก่อนเปลี่ยนสถานะ (SSE ไม่พลาด frame สุดท้าย)
+            while True:
+                try:
+                    _apply_message(job, messages.get_nowait())
+                except queue.Empty:
+                    break
+            job.result = future.result()
+        job.current = job.total
+        job.status = DONE
+    except Exception as e:
+        job.error, job.status = str(e), FAILED
+    finally:
+        job.finished_at = time.time()
+
+
+def _purge_expired() -> None:
+    now = time.time()
+    with _lock:
+        expired = [
+            job_id
+            for job_id, job in _jobs.items()
+            if job.finished_at is not None and now - job.finished_at > JOB_TTL_S
+        ]
+        for job_id in expired:
+            del _jobs[job_id]
+
+
+def submit_simulation(cfg: dict, stream_front: bool = False) -> SimulationJob:
+    """ส่ง simulation เข้า worker pool แล้วคืน job ทันที (ไม่รอผล)"""
+    _purge_expired()
+    job = SimulationJob(cfg, stream_front)
+    with _lock:
+        _jobs[job.job_id] = job
+    _executor.submit(_run_job, job)
+    return job
+
+
+def get_job(job_id: str) -> Optional[SimulationJob]:
+    with _lock:
+        return _jobs.get(job_id)
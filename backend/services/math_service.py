@@ -1,11 +1,12 @@
-from math_model import run_math_model
-
-
-def optimize_from_frontend(zones: dict, centers: list = None):
+def optimize_from_frontend(zones: dict, centers: list = None, deadline: float = None):
     """
     zones = { "A": 2400, "B": 1800 }
+    deadline: เวลา (time.time()) ที่ solver ต้องหยุด (ส่งต่อเป็น time_limit ของ HiGHS)
     """
     if not zones or not isinstance(zones, dict):
         raise ValueError("Zones data is invalid or empty")
 
-    return run_math_model(zones, centers)
+    # import pyomo เมื่อเรียกใช้ครั้งแรก (ไม่ถ่วง cold start ของ API)
+    from math_model import run_math_model
+
+    return run_math_model(zones, centers, deadline)
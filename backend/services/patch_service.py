@@ -0,0 +1,162 @@
+import os
+import tempfile
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from fire_simulator import (
+    GEE_DATASETS,
+    fetch_patch_from_gee,
+    fetch_patch_from_gee_tiled,
+    landcover_to_codes,
+    patch_region_bounds,
+)
+from store.patch_cache import PATCH_LAYERS, PatchCache
+
+PatchProvider = Callable[..., Tuple[np.ndarray, ...]]
+
+
+class CachedPatchProvider:
+    """ครอบ provider ใด ๆ ด้วย PatchCache (signature เดียวกับ fetch_patch_from_gee)"""
+
+    def __init__(self, provider: PatchProvider, cache: PatchCache):
+        self.provider = provider
+        self.cache = cache
+
+    def cache_key(self, lat, lon, month, grid_x, grid_y, cell_size, year=2025) -> str:
+        bounds = patch_region_bounds(lat, lon, grid_x, grid_y, cell_size)
+        return self.cache.make_key(
+            bounds=[round(b, 7) for b in bounds],
+            month=int(month),
+            year=int(year),
+            grid=[int(grid_x), int(grid_y)],
+            cell_size=float(cell_size),
+            datasets=GEE_DATASETS,
+            source=getattr(self.provider, "cache_tag", "gee"),
+        )
+
+    def __call__(self, lat, lon, month, grid_x, grid_y, cell_size, year=2025):
+        key = self.cache_key(lat, lon, month, grid_x, grid_y, cell_size, year)
+        arrays = self.cache.get(key)
+        if arrays is not None:
+            return arrays
+
+        arrays = self.provider(lat, lon, month, grid_x, grid_y, cell_size, year=year)
+        self.cache.put(key, arrays)
+        return arrays
+
+
+class GeePatchProvider:
+    """
+    ดึงจาก GEE: โดเมนเล็กใช้ fetch_patch_from_gee (single-shot)
+    โดเมนกว้างกว่า tiled_threshold_m ใช้ fetch_patch_from_gee_tiled (+ tile cache)
+    """
+
+    cache_tag = "gee"
+
+    def __init__(
+        self, tile_cache: Optional[PatchCache] = None, tiled_threshold_m: float = 10000.0
+    ):
+        self.tile_cache = tile_cache
+        self.tiled_threshold_m = float(tiled_threshold_m)
+
+    def __call__(self, lat, lon, month, grid_x, grid_y, cell_size, year=2025):
+        extent_m = max(grid_x, grid_y) * float(cell_size)
+        if extent_m > self.tiled_threshold_m:
+            return fetch_patch_from_gee_tiled(
+                lat,
+                lon,
+                month,
+                grid_x,
+                grid_y,
+                cell_size,
+                year=year,
+                tile_cache=self.tile_cache,
+            )
+        return fetch_patch_from_gee(
+            lat, lon, month, grid_x, grid_y, cell_size, year=year
+        )
+
+
+class OfflinePatchProvider:
+    """
+    stand-in ของ GEE สำหรับรัน/ทดสอบแบบ offline
+    - อ่าน patch ต้นแบบจากไฟล์ .npz (slope_tan, ndvi, lst, landcover)
+    - ย่อ/ขยายเป็นขนาดกริดที่ขอแบบ nearest (เหมือน cv2.INTER_NEAREST ใน fetch_patch_from_gee)
+    """
+
+    cache_tag = "offline"
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            slope, ndvi, lst, landcover = (data[name] for name in PATCH_LAYERS)
+        # ไฟล์รุ่นเก่าเก็บ landcover เป็นชื่อ class → แปลงเป็น uint8 code
+        self.layers = (slope, ndvi, lst, landcover_to_codes(landcover))
+        self.calls = 0
+
+    def __call__(self, lat, lon, month, grid_x, grid_y, cell_size, year=2025):
+        self.calls += 1
+        h, w = self.layers[0].shape
+        rows = (np.arange(grid_y) * h // grid_y).astype(np.intp)
+        cols = (np.arange(grid_x) * w // grid_x).astype(np.intp)
+        return tuple(layer[np.ix_(rows, cols)].copy() for layer in self.layers)
+
+
+_provider: Optional[PatchProvider] = None
+
+
+def get_patch_provider() -> PatchProvider:
+    """
+    provider ที่ใช้ใน API (สร้างครั้งเดียวจาก env)
+    - GEE_OFFLINE_PATCH: path ของ .npz → ใช้ OfflinePatchProvider แทน GEE
+    - GEE_TILED_THRESHOLD_M: โดเมนกว้างกว่านี้ (m) ดึงแบบ tiled
+    - PATCH_CACHE_DIR / PATCH_CACHE_MAX_MB / PATCH_CACHE_TTL_HOURS: ตั้งค่า disk cache
+      ของ patch และ tile (PATCH_CACHE_MAX_MB=0 → ปิด cache)
+    """
+    global _provider
+    if _provider is not None:
+        return _provider
+
+    cache_dir = os.getenv(
+        "PATCH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fire_patch_cache")
+    )
+    max_mb = float(os.getenv("PATCH_CACHE_MAX_MB", "256"))
+    ttl_seconds = float(os.getenv("PATCH_CACHE_TTL_HOURS", "168")) * 3600
+
+    offline_path = os.getenv("GEE_OFFLINE_PATCH")
+    if offline_path:
+        provider: PatchProvider = OfflinePatchProvider(offline_path)
+    else:
+        tile_cache = None
+        if max_mb > 0:
+            tile_cache = PatchCache(
+                os.path.join(cache_dir, "tiles"),
+                max_bytes=int(max_mb * 1024 * 1024),
+                ttl_seconds=ttl_seconds,
+            )
+        provider = GeePatchProvider(
+            tile_cache=tile_cache,
+            tiled_threshold_m=float(os.getenv("GEE_TILED_THRESHOLD_M", "10000")),
+        )
+
+    if max_mb > 0:
+        cache = PatchCache(
+            cache_dir, max_bytes=int(max_mb * 1024 * 1024), ttl_seconds=ttl_seconds
+        )
+        provider = CachedPatchProvider(provider, cache)
+
+    _provider = provider
+    return _provider
+
+
+def patch_cache_stats() -> Dict[str, Optional[Dict[str, Any]]]:
+    """hit / miss ของ patch cache และ tile cache ใน process นี้ (ยังไม่ได้สร้าง / ปิด cache → None)"""
+    provider = _provider
+    patch_cache = provider.cache if isinstance(provider, CachedPatchProvider) else None
+    if patch_cache is not None:
+        provider = provider.provider
+    tile_cache = getattr(provider, "tile_cache", None)
+    return {
+        "patch": patch_cache.stats() if patch_cache is not None else None,
+        "tile": tile_cache.stats() if tile_cache is not None else None,
+    }
@@ -0,0 +1,110 @@
+import base64
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from fire_simulator import BURNED, BURNING, IntegratedRothermelFireSimulator
+
+# รูปแบบที่ส่งให้ frontend: png (uint16/uint8 grayscale) | zlib (raw little-endian) | rle (JSON)
+RASTER_ENCODINGS = ("png", "zlib", "rle")
+ARRIVAL_NODATA = 65535  # เซลล์ที่ไฟไปไม่ถึง
+METERS_PER_DEG_LAT = 111320.0
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def encode_grid(arr: np.ndarray, encoding: str) -> Dict[str, Any]:
+    """กริด uint8 / uint16 → payload บีบอัด (row-major, แถว 0 = ทิศเหนือ)"""
+    if encoding not in RASTER_ENCODINGS:
+        raise ValueError(f"Unknown raster encoding '{encoding}', expected one of {RASTER_ENCODINGS}")
+    arr = np.ascontiguousarray(arr)
+    out = {"encoding": encoding, "dtype": arr.dtype.name}
+
+    if encoding == "png":
+        import cv2
+
+        ok, png = cv2.imencode(".png", arr, [cv2.IMWRITE_PNG_COMPRESSION, 6])
+        if not ok:
+            raise ValueError("PNG encoding failed")
+        out["data"] = _b64(png.tobytes())
+    elif encoding == "zlib":
+        out["data"] = _b64(zlib.compress(arr.astype(arr.dtype.newbyteorder("<")).tobytes(), 6))
+    else:
+        # runs ของ flat array: [value, length, value, length, ...]
+        flat = arr.ravel()
+        starts = np.flatnonzero(np.r_[True, flat[1:] != flat[:-1]])
+        lengths = np.diff(np.r_[starts, flat.size])
+        out["runs"] = np.column_stack([flat[starts], lengths]).ravel().tolist()
+    return out
+
+
+def seconds_to_minutes(seconds: np.ndarray, reached: np.ndarray) -> np.ndarray:
+    """เวลา (วินาที) → uint16 นาที ปัดขึ้น ; เซลล์ที่ reached เป็น False → ARRIVAL_NODATA"""
+    minutes = np.full(reached.shape, ARRIVAL_NODATA, dtype=np.uint16)
+    t = np.ceil(np.asarray(seconds)[reached].astype(np.float64) / 60.0)
+    minutes[reached] = np.clip(t, 0, ARRIVAL_NODATA - 1).astype(np.uint16)
+    return minutes
+
+
+def arrival_minutes(sim: IntegratedRothermelFireSimulator) -> np.ndarray:
+    """เวลาไฟมาถึง (นาที ปัดขึ้น) เป็น uint16 ; ไฟไปไม่ถึง → ARRIVAL_NODATA"""
+    ignited = (sim.state == BURNING) | (sim.state == BURNED)
+    return seconds_to_minutes(sim.ignition_time, ignited)
+
+
+def grid_georef(sim: IntegratedRothermelFireSimulator) -> Dict[str, Any]:
+    """พิกัดกลางเซลล์ (0, 0) และขนาดเซลล์เป็นองศา (กริดตั้งกลางที่ lat/lon เหมือน get_last_ignition_point)"""
+    deg_lat = sim.cell_size / METERS_PER_DEG_LAT
+    deg_lon = sim.cell_size / (METERS_PER_DEG_LAT * np.cos(np.radians(sim.lat)))
+    return {
+        "origin_lat": sim.lat + (sim.grid_y // 2) * deg_lat,
+        "origin_lon": sim.lon - (sim.grid_x // 2) * deg_lon,
+        "cell_deg_lat": deg_lat,
+        "cell_deg_lon": deg_lon,
+    }
+
+
+def isochrones(
+    arrival: np.ndarray, minutes: Sequence[float], georef: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """เส้นขอบพื้นที่ที่ไฟไปถึงภายใน m นาที (cv2.findContours) เป็น [lon, lat]"""
+    import cv2
+
+    out = []
+    for m in sorted(minutes):
+        mask = ((arrival <= m) & (arrival != ARRIVAL_NODATA)).astype(np.uint8)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        polygons = []
+        for contour in contours:
+            pts = contour.reshape(-1, 2).astype(np.float64)  # (x=col, y=row)
+            lon = georef["origin_lon"] + pts[:, 0] * georef["cell_deg_lon"]
+            lat = georef["origin_lat"] - pts[:, 1] * georef["cell_deg_lat"]
+            polygons.append(np.round(np.column_stack([lon, lat]), 7).tolist())
+        out.append({"t_min": float(m), "polygons": polygons})
+    return out
+
+
+def encode_rasters(
+    sim: IntegratedRothermelFireSimulator,
+    encoding: str = "png",
+    isochrone_minutes: Optional[Sequence[float]] = None,
+) -> Dict[str, Any]:
+    """
+    raster สำหรับวาดแผนที่การลาม: เวลาไฟมาถึง (uint16 นาที) + state (uint8)
+    ส่งแบบบีบอัดแทน JSON list ทั้งกริด (+ isochrone polygon ถ้าขอ)
+    """
+    arrival = arrival_minutes(sim)
+    georef = grid_georef(sim)
+    out = {
+        "shape": [sim.grid_y, sim.grid_x],
+        "cell_size_m": sim.cell_size,
+        **georef,
+        "arrival_min": {**encode_grid(arrival, encoding), "nodata": ARRIVAL_NODATA},
+        "state": encode_grid(sim.state.astype(np.uint8), encoding),
+    }
+    if isochrone_minutes:
+        out["isochrones"] = isochrones(arrival, isochrone_minutes, georef)
+    return out
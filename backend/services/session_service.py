@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from services.executor_service import SIM_TASK_TIMEOUT_S, run_in_process
+from services.fire_service import advance_simulation
+
+# อายุของ session ที่ไม่มีการใช้งาน และจำนวน session สูงสุดที่เก็บใน process นี้
+SESSION_TTL_S = float(os.getenv("SIM_SESSION_TTL_S", "3600"))
+SESSION_MAX = int(os.getenv("SIM_SESSION_MAX", "200"))
+
+
+class SimulationSession:
+    """
+    การจำลองที่เดินทีละช่วง (dashboard) — เก็บแค่ snapshot (bytes) ไม่ผูกกับ worker ตัวไหน
+    fork → session ใหม่ใช้ snapshot เดียวกัน (bytes ไม่ถูกแก้ จึงแชร์ได้ไม่ต้อง copy)
+    """
+
+    def __init__(
+        self,
+        cfg: dict,
+        wind: Optional[Tuple[float, float, Optional[list]]] = None,
+        snapshot: Optional[bytes] = None,
+        parent_id: Optional[str] = None,
+    ):
+        self.session_id = uuid.uuid4().hex
+        self.cfg = cfg
+        self.wind = wind
+        self.snapshot = snapshot
+        self.parent_id = parent_id
+        self.wind_override: Optional[Tuple[Optional[float], Optional[float]]] = None
+        self.elapsed_min = 0.0
+        self.result: Optional[dict] = None
+        self.updated_at = time.time()
+        self.lock = asyncio.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "parent_id": self.parent_id,
+            "elapsed_min": self.elapsed_min,
+            "snapshot_bytes": len(self.snapshot or b""),
+            "updated_at": self.updated_at,
+            "result": self.result,
+        }
+
+
+# แก้ได้เฉพาะบน event loop (handler ที่แตะ _sessions ต้องเป็น async) จึงไม่ต้องมี lock
+_sessions: Dict[str, SimulationSession] = {}
+
+
+def _purge_expired() -> None:
+    now = time.time()
+    for session_id in [k for k, v in _sessions.items() if now - v.updated_at > SESSION_TTL_S]:
+        del _sessions[session_id]
+    # เกินจำนวน → ทิ้งตัวที่ไม่ได้ใช้นานสุด
+    for session_id in sorted(_sessions, key=lambda k: _sessions[k].updated_at)[
+        : max(0, len(_sessions) - SESSION_MAX + 1)
+    ]:
+        del _sessions[session_id]
+
+
+def _register(session: SimulationSession) -> SimulationSession:
+    _purge_expired()
+    _sessions[session.session_id] = session
+    return session
+
+
+def get_session(session_id: str) -> Optional[SimulationSession]:
+    return _sessions.get(session_id)
+
+
+async def step_session(session: SimulationSession, minutes: float) -> SimulationSession:
+    """เดิน session ต่อ minutes นาที (ใน process pool) ; คำขอซ้อนกันของ session เดียวรอคิวกัน"""
+    async with session.lock:
+        deadline = time.time() + SIM_TASK_TIMEOUT_S
+        out = await run_in_process(
+            advance_simulation,
+            session.cfg,
+            session.snapshot,
+            session.elapsed_min + minutes,
+            session.wind,
+            session.wind_override,
+            deadline,
+        )
+        session.wind, session.snapshot = out["wind"], out["snapshot"]
+        session.wind_override = None  # มีผลแล้ว (อยู่ใน snapshot)
+        session.result = out["result"]
+        session.elapsed_min = out["result"]["elapsed_min"]
+        session.updated_at = time.time()
+    return session
+
+
+async def create_session(cfg: dict) -> SimulationSession:
+    """session ใหม่ที่ t=0 (จุดตั้งต้นถูกจุดแล้ว)"""
+    return await step_session(_register(SimulationSession(cfg)), 0.0)
+
+
+async def fork_session(
+    session: SimulationSession,
+    wind_speed: Optional[float] = None,
+    wind_dir: Optional[float] = None,
+) -> SimulationSession:
+    """แตกกิ่งจากจุดที่ session รันถึง (ระบุลม → กิ่งใหม่ใช้ลมคงที่นั้นตั้งแต่ตอนนี้) ; รอ step ที่ค้างอยู่ก่อน"""
+    async with session.lock:
+        child = SimulationSession(session.cfg, session.wind, session.snapshot, session.session_id)
+        child.elapsed_min, child.result = session.elapsed_min, session.result
+        child.wind_override = session.wind_override
+    if wind_speed is not None or wind_dir is not None:
+        child.wind_override = (wind_speed, wind_dir)
+    return _register(child)
@@ -1,4 +1,314 @@
+import json
+import math
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from store.wind_cache import DaySeries, WindCache
+
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+HOURLY_VARS = ("wind_speed_10m", "wind_direction_10m")
+WIND_TIMEZONE = "Asia/Bangkok"
+# ช่วง fuzzy รอบความเร็วลมรายชั่วโมง (m/s) → (speed - delta, speed + delta)
+WIND_FUZZY_DELTA = 1.0
+
+# ความละเอียดกริดของ archive (ERA5-Land ~0.1°) → จุดที่ห่างกันไม่ถึง 1 ช่องใช้ cache ร่วมกัน
+WIND_GRID_DEG = float(os.getenv("WIND_GRID_DEG", "0.1"))
+WIND_HTTP_TIMEOUT_S = float(os.getenv("WIND_HTTP_TIMEOUT_S", "10"))
+WIND_HTTP_POOL = int(os.getenv("WIND_HTTP_POOL", "8"))
+# จำนวนพิกัดสูงสุดต่อ 1 archive call ตอน prefetch (URL ยาวเกินไปจะโดนตัด)
+WIND_BULK_MAX_POINTS = int(os.getenv("WIND_BULK_MAX_POINTS", "50"))
+# จำนวนวัน (ต่อพิกัด) สูงสุดใน cache ชั้นหน่วยความจำ (LRU ; ชั้นดิสก์ไม่จำกัด)
+WIND_CACHE_MAX_DAYS = int(os.getenv("WIND_CACHE_MAX_DAYS", "2048"))
+
+Point = Tuple[float, float]
+
+
+def snap_to_grid(value: float, grid_deg: float = WIND_GRID_DEG) -> float:
+    if grid_deg <= 0:
+        return round(float(value), 6)
+    return round(round(float(value) / grid_deg) * grid_deg, 6)
+
+
+def _make_session() -> requests.Session:
+    """Session เดียวใช้ซ้ำ connection (keep-alive) + retry/backoff เมื่อโดน 429 / 5xx"""
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=WIND_HTTP_POOL, pool_maxsize=WIND_HTTP_POOL, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _split_days(hourly: dict) -> Dict[str, DaySeries]:
+    """แยก hourly series หลายวันของ Open-Meteo เป็นรายวัน {"YYYY-MM-DD": DaySeries}"""
+    days: Dict[str, DaySeries] = {}
+    for idx, t in enumerate(hourly["time"]):
+        day = days.setdefault(t[:10], {"time": [], **{v: [] for v in HOURLY_VARS}})
+        day["time"].append(t)
+        for var in HOURLY_VARS:
+            day[var].append(hourly[var][idx])
+    return days
+
+
+class OpenMeteoWindProvider:
+    """ดึงลมรายชั่วโมงจาก Open-Meteo archive ผ่าน session ที่ pool connection ไว้"""
+
+    cache_tag = "open-meteo"
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        timeout: float = WIND_HTTP_TIMEOUT_S,
+    ):
+        self.session = session or _make_session()
+        self.timeout = timeout
+
+    def fetch_days(
+        self, lat: float, lon: float, start_date: str, end_date: str
+    ) -> Dict[str, DaySeries]:
+        return self.fetch_points([(lat, lon)], start_date, end_date)[0]
+
+    def fetch_points(
+        self, points: List[Point], start_date: str, end_date: str
+    ) -> List[Dict[str, DaySeries]]:
+        """หลายพิกัด × ช่วงวัน ใน request เดียว (Open-Meteo รับ latitude/longitude คั่นด้วย ,)"""
+        params = {
+            "latitude": ",".join(str(lat) for lat, _ in points),
+            "longitude": ",".join(str(lon) for _, lon in points),
+            "start_date": start_date,
+            "end_date": end_date,
+            "hourly": ",".join(HOURLY_VARS),
+            "timezone": WIND_TIMEZONE,
+            "wind_speed_unit": "ms",
+        }
+        resp = self.session.get(ARCHIVE_URL, params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        data = resp.json()
+        # 1 พิกัด → object เดียว ; หลายพิกัด → list ตามลำดับที่ส่งไป
+        locations = data if isinstance(data, list) else [data]
+        return [_split_days(loc["hourly"]) for loc in locations]
+
+
+class OfflineWindProvider:
+    """
+    stand-in ของ Open-Meteo สำหรับรัน/ทดสอบแบบ offline
+    - speed / direction: ค่าเดียวทั้งวัน หรือ list 24 ค่า (รายชั่วโมง)
+    """
+
+    cache_tag = "offline"
+
+    def __init__(
+        self,
+        speed: Union[float, List[float]] = 3.0,
+        direction: Union[float, List[float]] = 0.0,
+    ):
+        self.speed = speed if isinstance(speed, list) else [float(speed)] * 24
+        self.direction = (
+            direction if isinstance(direction, list) else [float(direction)] * 24
+        )
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: str) -> "OfflineWindProvider":
+        """อ่าน JSON {"wind_speed_10m": ..., "wind_direction_10m": ...}"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["wind_speed_10m"], data["wind_direction_10m"])
+
+    def fetch_days(
+        self, lat: float, lon: float, start_date: str, end_date: str
+    ) -> Dict[str, DaySeries]:
+        self.calls += 1
+        return {
+            ds: {
+                "time": [f"{ds}T{h:02d}:00" for h in range(24)],
+                "wind_speed_10m": list(self.speed),
+                "wind_direction_10m": list(self.direction),
+            }
+            for ds in _date_range(start_date, end_date)
+        }
+
+    def fetch_points(
+        self, points: List[Point], start_date: str, end_date: str
+    ) -> List[Dict[str, DaySeries]]:
+        return [self.fetch_days(lat, lon, start_date, end_date) for lat, lon in points]
+
+
+class CachedWindProvider:
+    """
+    ครอบ provider ด้วย WindCache
+    - snap (lat, lon) เข้ากริดของ archive ก่อนทั้งตอนสร้าง key และตอนดึงจริง
+    - เก็บ series ทั้งวัน → ชั่วโมงอื่นของวันเดียวกันไม่ต้องดึงซ้ำ
+    - คำขอ key เดียวกันพร้อมกันจะดึงแค่ครั้งเดียว
+    - วันที่ยังมีค่า null (archive ยังไม่ครบ) จะไม่ถูก cache
+    """
+
+    def __init__(self, provider, cache: WindCache, grid_deg: float = WIND_GRID_DEG):
+        self.provider = provider
+        self.cache = cache
+        self.grid_deg = grid_deg
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def cache_key(self, lat: float, lon: float, date_str: str) -> str:
+        return self.cache.make_key(
+            lat=snap_to_grid(lat, self.grid_deg),
+            lon=snap_to_grid(lon, self.grid_deg),
+            date=date_str,
+            tz=WIND_TIMEZONE,
+            source=getattr(self.provider, "cache_tag", "open-meteo"),
+        )
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def day_series(self, lat: float, lon: float, date_str: str) -> DaySeries:
+        key = self.cache_key(lat, lon, date_str)
+        series = self.cache.get(key)
+        if series is not None:
+            return series
+
+        with self._key_lock(key):
+            series = self.cache.get(key)
+            if series is not None:
+                return series
+            days = self.provider.fetch_days(
+                snap_to_grid(lat, self.grid_deg),
+                snap_to_grid(lon, self.grid_deg),
+                date_str,
+                date_str,
+            )
+            series = days[date_str]
+            if _is_complete(series):
+                self.cache.put(key, series)
+        return series
+
+    def prefetch(
+        self, points: List[Point], start_date: str, end_date: str
+    ) -> Dict[str, Any]:
+        """
+        เติม cache ให้ทุก (พิกัด, วัน) ในช่วง [start_date, end_date] ด้วย archive call ให้น้อยที่สุด
+        - snap + ตัดพิกัดซ้ำ แล้วข้ามวันที่มีใน cache แล้ว
+        - จัดกลุ่มพิกัดที่ขาดช่วงวันเดียวกัน → 1 call ต่อกลุ่มละไม่เกิน WIND_BULK_MAX_POINTS พิกัด
+        คืน {"series": {(snapped lat, lon): {day: DaySeries}}, "archive_calls": n}
+        """
+        days = _date_range(start_date, end_date)
+        snapped = sorted(
+            {
+                (snap_to_grid(lat, self.grid_deg), snap_to_grid(lon, self.grid_deg))
+                for lat, lon in points
+            }
+        )
+
+        series: Dict[Point, Dict[str, DaySeries]] = {pt: {} for pt in snapped}
+        spans: Dict[Tuple[str, str], List[Point]] = {}
+        for pt in snapped:
+            missing = []
+            for ds in days:
+                cached = self.cache.get(self.cache_key(pt[0], pt[1], ds))
+                if cached is None:
+                    missing.append(ds)
+                else:
+                    series[pt][ds] = cached
+            if missing:
+                spans.setdefault((missing[0], missing[-1]), []).append(pt)
+
+        calls = 0
+        for (first, last), pts in spans.items():
+            for k in range(0, len(pts), max(1, WIND_BULK_MAX_POINTS)):
+                chunk = pts[k : k + max(1, WIND_BULK_MAX_POINTS)]
+                fetched = self.provider.fetch_points(chunk, first, last)
+                calls += 1
+                for pt, pt_days in zip(chunk, fetched):
+                    for ds, day_series in pt_days.items():
+                        if ds not in series[pt] and _is_complete(day_series):
+                            self.cache.put(self.cache_key(pt[0], pt[1], ds), day_series)
+                        series[pt].setdefault(ds, day_series)
+
+        return {"series": series, "archive_calls": calls}
+
+
+def _date_range(start_date: str, end_date: str) -> List[str]:
+    d, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if end < d:
+        raise ValueError("end_date must not be before start_date")
+    out = []
+    while d <= end:
+        out.append(d.isoformat())
+        d += timedelta(days=1)
+    return out
+
+
+def _is_complete(series: DaySeries) -> bool:
+    return bool(series["time"]) and all(
+        v is not None for var in HOURLY_VARS for v in series[var]
+    )
+
+
+_provider: Optional[CachedWindProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_wind_provider() -> CachedWindProvider:
+    """
+    provider ลมที่ใช้ใน API (สร้างครั้งเดียวจาก env)
+    - WIND_OFFLINE_FILE: path ของ JSON → ใช้ OfflineWindProvider แทน Open-Meteo
+    - WIND_CACHE_DIR: โฟลเดอร์ cache ถาวร ("" → cache ในหน่วยความจำอย่างเดียว)
+    - WIND_GRID_DEG: ความละเอียดที่ใช้ snap พิกัด
+    - WIND_CACHE_MAX_DAYS: จำนวนวันสูงสุดใน cache ชั้นหน่วยความจำ
+    """
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            offline_path = os.getenv("WIND_OFFLINE_FILE")
+            if offline_path:
+                provider = OfflineWindProvider.from_file(offline_path)
+            else:
+                provider = OpenMeteoWindProvider()
+            cache_dir = os.getenv(
+                "WIND_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fire_wind_cache")
+            )
+            _provider = CachedWindProvider(
+                provider, WindCache(cache_dir or None, max_entries=WIND_CACHE_MAX_DAYS)
+            )
+    return _provider
+
+
+def _wind_at(series: DaySeries, date_str: str, hour: int) -> Tuple[float, float, float]:
+    """ลมของชั่วโมง hour ใน series ของวัน date_str → (wind_min, wind_max, direction)"""
+    target_time = f"{date_str}T{hour:02d}:00"
+    times = series["time"]
+
+    if target_time not in times:
+        raise RuntimeError(f"Wind data not found at {target_time}")
+
+    idx = times.index(target_time)
+
+    speed = series["wind_speed_10m"][idx]
+    direction = series["wind_direction_10m"][idx]
+    if speed is None or direction is None:
+        raise RuntimeError(f"Wind data not found at {target_time}")
+
+    wind_min = max(speed - WIND_FUZZY_DELTA, 0.0)
+    wind_max = speed + WIND_FUZZY_DELTA
+
+    return wind_min, wind_max, direction
 
 
 def fetch_wind_from_api_for_date(
@@ -10,38 +320,59 @@ def fetch_wind_from_api_for_date(
     hour: int = 13,
 ):
     date_str = f"{year:04d}-{month:02d}-{day:02d}"
+    series = get_wind_provider().day_series(lat, lon, date_str)
+    return _wind_at(series, date_str, hour)
 
-    url = "https://archive-api.open-meteo.com/v1/archive"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": date_str,
-        "end_date": date_str,
-        "hourly": "wind_speed_10m,wind_direction_10m",
-        "timezone": "Asia/Bangkok",
-        "wind_speed_unit": "ms",
-    }
-
-    resp = requests.get(url, params=params, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
 
-    target_time = f"{date_str}T{hour:02d}:00"
-    times = data["hourly"]["time"]
-
-    if target_time not in times:
-        raise RuntimeError(f"Wind data not found at {target_time}")
+def fetch_wind_schedule_for_date(
+    lat: float,
+    lon: float,
+    year: int,
+    month: int,
+    day: int,
+    hour: int = 13,
+    sim_minutes: float = 60,
+) -> List[Tuple[float, float, float, float]]:
+    """
+    ลมรายชั่วโมงตั้งแต่ hour จนจบการจำลอง (ข้ามวันได้) จาก series ทั้งวันใน cache
+    คืน [(t วินาทีนับจากเริ่ม, wind_min, wind_max, direction), ...]
+    """
+    provider = get_wind_provider()
+    start = date(year, month, day)
+    n_hours = max(1, math.ceil(float(sim_minutes) / 60.0))
 
-    idx = times.index(target_time)
+    schedule = []
+    for k in range(n_hours):
+        h = hour + k
+        ds = (start + timedelta(days=h // 24)).isoformat()
+        series = provider.day_series(lat, lon, ds)
+        schedule.append((k * 3600.0, *_wind_at(series, ds, h % 24)))
+    return schedule
 
-    speed = data["hourly"]["wind_speed_10m"][idx]
-    direction = data["hourly"]["wind_direction_10m"][idx]
 
-    delta = 1.0
-    wind_min = max(speed - delta, 0.0)
-    wind_max = speed + delta
+def prefetch_wind(
+    points: List[Point], start_date: str, end_date: str
+) -> Dict[str, Any]:
+    """
+    bulk prefetch สำหรับศึกษาหลาย scenario: ดึงลมรายชั่วโมงของทุกพิกัดตลอดช่วงวัน
+    แล้วคืน series ต่อพิกัด (เรียงตามเวลา) พร้อมจำนวน archive call ที่ใช้จริง
+    """
+    provider = get_wind_provider()
+    result = provider.prefetch(points, start_date, end_date)
+    days = _date_range(start_date, end_date)
 
-    return wind_min, wind_max, direction
+    out = []
+    for lat, lon in points:
+        pt = (snap_to_grid(lat, provider.grid_deg), snap_to_grid(lon, provider.grid_deg))
+        merged: DaySeries = {"time": [], **{v: [] for v in HOURLY_VARS}}
+        for ds in days:
+            day_series = result["series"][pt].get(ds)
+            if day_series is None:
+                continue
+            for k in merged:
+                merged[k].extend(day_series[k])
+        out.append({"lat": lat, "lon": lon, "grid_lat": pt[0], "grid_lon": pt[1], **merged})
+    return {"archive_calls": result["archive_calls"], "points": out}
 
 
 def fuzzy_wind(min_w: float, max_w: float) -> float:
@@ -0,0 +1,62 @@
+# store/env_cache.py
+"""
+LRU cache ในหน่วยความจำของ environment ที่เตรียมพร้อมแล้ว (ต่อ process)
+
+- เก็บ object ใด ๆ พร้อมขนาด (ไบต์) ที่ผู้ใส่บอกมา
+- เกิน max_bytes → ไล่ตัวที่ใช้ล่าสุดนานที่สุดออกก่อน
+- object ที่ใหญ่กว่า max_bytes เองจะไม่ถูกเก็บ
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class EnvironmentCache:
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.max_bytes = int(max_bytes)
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self._entries: OrderedDict[Hashable, Tuple[Any, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: int) -> None:
+        nbytes = int(nbytes)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, size) = self._entries.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,126 @@
+# store/patch_cache.py
+"""
+Disk cache ของ environmental patch (slope / NDVI / LST / landcover)
+
+- key = sha256 ของ (ขอบเขต region, month, year, grid, cell_size, ชุดข้อมูล GEE)
+- ใช้ได้ทั้ง patch ทั้งผืน (PATCH_LAYERS) และ tile ย่อย (ส่ง names เอง)
+- เก็บ 1 ไฟล์ .npz ต่อ key (เขียนลงไฟล์ชั่วคราวแล้ว os.replace → ไม่มีไฟล์ครึ่ง ๆ)
+- LRU ตาม mtime (hit จะ touch ไฟล์) + จำกัดขนาดรวม max_bytes
+- TTL: ไฟล์ที่เก่ากว่า ttl_seconds (นับจากเวลาที่เขียน) ถือว่า miss และถูกลบ
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+PATCH_CACHE_VERSION = 2  # 2: landcover เป็น uint8 code
+PATCH_LAYERS = ("slope_tan", "ndvi", "lst", "landcover")
+
+
+class PatchCache:
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self.hits, self.misses = 0, 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        payload = json.dumps(
+            {"v": PATCH_CACHE_VERSION, **parts}, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(
+        self, key: str, names: Tuple[str, ...] = PATCH_LAYERS
+    ) -> Optional[Tuple[np.ndarray, ...]]:
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                created = float(data["_created"])
+                if self.ttl_seconds is not None and (
+                    time.time() - created > self.ttl_seconds
+                ):
+                    raise FileNotFoundError(path)
+                arrays = tuple(data[name] for name in names)
+        except (OSError, KeyError, ValueError):
+            self._discard(path)
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)  # LRU touch
+        except OSError:
+            pass
+        self.hits += 1
+        return arrays
+
+    def put(
+        self,
+        key: str,
+        arrays: Tuple[np.ndarray, ...],
+        names: Tuple[str, ...] = PATCH_LAYERS,
+    ) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        payload = {name: np.asarray(arr) for name, arr in zip(names, arrays)}
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, _created=np.float64(time.time()), **payload)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _discard(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".npz"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._discard(os.path.join(self.cache_dir, name))
+                total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        files = [n for n in os.listdir(self.cache_dir) if n.endswith(".npz")]
+        size = 0
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(files),
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
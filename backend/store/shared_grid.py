@@ -0,0 +1,116 @@
+# store/shared_grid.py
+"""
+แชร์กริด numpy ข้าม process โดยไม่ copy (เช่น environment ของ ensemble → worker)
+
+- backend "shm": multiprocessing.shared_memory (อยู่ใน RAM, ไม่ผ่าน pickle)
+- backend "memmap": ไฟล์ .npy + np.load(mmap_mode="r") (OS page cache, swap ออกได้)
+- ฝั่งเจ้าของ: SharedGrids.create(arrays) → .handle (dict เล็ก ๆ pickle ได้) → ส่งให้ worker
+- ฝั่ง worker: attach_grids(handle) → dict ของ array อ่านอย่างเดียว
+- เจ้าของต้องเรียก close() เมื่อเลิกใช้ (ลบ shared memory / ไฟล์)
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Dict, List
+
+import numpy as np
+
+SHARED_GRID_BACKENDS = ("shm", "memmap")
+
+# attachment ฝั่ง worker (เก็บไว้ให้ view ยังใช้ได้ + ใช้ซ้ำข้าม task ของ handle เดียวกัน)
+_attached: Dict[str, Any] = {}
+_attached_lock = threading.Lock()
+
+
+class SharedGrids:
+    def __init__(self, backend: str, handle: Dict[str, Any], resources: List[Any]):
+        self.backend = backend
+        self.handle = handle
+        self._resources = resources
+
+    @classmethod
+    def create(
+        cls, arrays: Dict[str, np.ndarray], backend: str = "shm"
+    ) -> "SharedGrids":
+        if backend not in SHARED_GRID_BACKENDS:
+            raise ValueError(
+                f"Unknown shared grid backend '{backend}', expected one of {SHARED_GRID_BACKENDS}"
+            )
+
+        specs, resources = {}, []
+        if backend == "memmap":
+            directory = tempfile.mkdtemp(prefix="fire_grids_")
+            resources.append(directory)
+            for name, arr in arrays.items():
+                path = os.path.join(directory, f"{name}.npy")
+                np.save(path, np.ascontiguousarray(arr))
+                specs[name] = path
+        else:
+            for name, arr in arrays.items():
+                arr = np.ascontiguousarray(arr)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+                resources.append(shm)
+                specs[name] = (shm.name, arr.shape, arr.dtype.str)
+
+        return cls(backend, {"backend": backend, "arrays": specs}, resources)
+
+    def close(self) -> None:
+        for res in self._resources:
+            if isinstance(res, str):
+                shutil.rmtree(res, ignore_errors=True)
+            else:
+                res.close()
+                try:
+                    res.unlink()
+                except FileNotFoundError:
+                    pass
+        self._resources = []
+
+    def __enter__(self) -> "SharedGrids":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _attach_shm(shm_name: str) -> shared_memory.SharedMemory:
+    with _attached_lock:
+        shm = _attached.get(shm_name)
+        if shm is None:
+            # worker ของ pool ใช้ resource_tracker ตัวเดียวกับเจ้าของ → ไม่ต้อง unregister
+            shm = shared_memory.SharedMemory(name=shm_name)
+            _attached[shm_name] = shm
+        return shm
+
+
+def _release_stale(keep: set) -> None:
+    """ปิด attachment ของ handle เก่า (เจ้าของ unlink ไปแล้ว → คืนหน่วยความจำได้เมื่อปิด)"""
+    with _attached_lock:
+        for shm_name in [n for n in _attached if n not in keep]:
+            try:
+                _attached[shm_name].close()
+            except BufferError:
+                continue  # ยังมี view ใช้อยู่ → ลองใหม่รอบหน้า
+            del _attached[shm_name]
+
+
+def attach_grids(handle: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """เปิด array จาก handle ของ SharedGrids (ไม่ copy, อ่านอย่างเดียว)"""
+    if handle["backend"] == "shm":
+        _release_stale({spec[0] for spec in handle["arrays"].values()})
+
+    out = {}
+    for name, spec in handle["arrays"].items():
+        if handle["backend"] == "memmap":
+            arr = np.load(spec, mmap_mode="r")
+        else:
+            shm_name, shape, dtype = spec
+            arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_attach_shm(shm_name).buf)
+            arr.flags.writeable = False
+        out[name] = arr
+    return out
+
@@ -0,0 +1,114 @@
+# store/wind_cache.py
+"""
+Cache ของลมรายชั่วโมง (Open-Meteo archive) ทั้งวัน ต่อ (lat, lon ที่ snap แล้ว, วันที่)
+
+- ข้อมูลย้อนหลังไม่เปลี่ยน → เก็บถาวรได้ (ttl_seconds=None)
+- ชั้นแรกเป็น LRU ในหน่วยความจำ (ไม่เกิน max_entries วัน) ชั้นสองเป็นไฟล์ JSON 1 ไฟล์ต่อวัน
+- เขียนลงไฟล์ชั่วคราวแล้ว os.replace → ไม่มีไฟล์ครึ่ง ๆ
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+WIND_CACHE_VERSION = 1
+
+# series ของ 1 วัน: {"time": [...], "wind_speed_10m": [...], "wind_direction_10m": [...]}
+DaySeries = Dict[str, List[Any]]
+
+
+class WindCache:
+    def __init__(
+        self,
+        cache_dir: Optional[str],
+        ttl_seconds: Optional[float] = None,
+        max_entries: int = 2048,
+    ):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self._memory: OrderedDict[str, DaySeries] = OrderedDict()
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        payload = json.dumps(
+            {"v": WIND_CACHE_VERSION, **parts}, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[DaySeries]:
+        with self._lock:
+            series = self._memory.get(key)
+            if series is not None:
+                self._memory.move_to_end(key)
+        if series is None and self.cache_dir:
+            series = self._load(key)
+            if series is not None:
+                self._remember(key, series)
+
+        if series is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return series
+
+    def _load(self, key: str) -> Optional[DaySeries]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            if self.ttl_seconds is not None and (
+                time.time() - float(payload["_created"]) > self.ttl_seconds
+            ):
+                raise FileNotFoundError(path)
+            return payload["series"]
+        except (OSError, KeyError, ValueError):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _remember(self, key: str, series: DaySeries) -> None:
+        """ใส่ชั้นหน่วยความจำ ; เกิน max_entries → ไล่วันที่ใช้ล่าสุดนานที่สุดออก (ยังอยู่บนดิสก์)"""
+        with self._lock:
+            self._memory[key] = series
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key: str, series: DaySeries) -> None:
+        self._remember(key, series)
+        if not self.cache_dir:
+            return
+
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"_created": time.time(), "series": series}, f)
+        os.replace(tmp, path)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = len(self._memory)
+        if self.cache_dir:
+            entries = sum(1 for n in os.listdir(self.cache_dir) if n.endswith(".json"))
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+        }
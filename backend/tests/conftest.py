@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 📦 ให้ test import โมดูลของ backend ได้ (fire_simulator, services, ...) เหมือนรันจาก backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
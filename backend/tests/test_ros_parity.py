@@ -0,0 +1,55 @@
+"""
+🔥 ROS แบบกริด (calculate_ros_grid / rothermel_base_terms + apply_wind_slope ที่ simulator ใช้)
+ต้องตรงกับ calculate_ros แบบสเกลาร์ (reference) ทีละเซลล์
+"""
+import numpy as np
+import pytest
+
+from fire_simulator import (
+    LANDCOVER_CLASSES,
+    NDVI_FUEL_BREAKS,
+    ROS_CUTOFF_MPS,
+    calculate_ros,
+    calculate_ros_grid,
+    landcover_names,
+)
+
+N_CELLS = 4000
+
+
+@pytest.fixture(scope="module")
+def cells():
+    """
+    เซลล์สุ่ม + กรณีขอบ: NaN ใน slope / NDVI / LST,
+    NDVI ที่จุดแบ่ง fuel model (0.25, 0.45) และรอบ ๆ, ทุก landcover
+    """
+    rng = np.random.default_rng(11)
+    slope = np.tan(np.radians(rng.uniform(0.0, 45.0, N_CELLS)))
+    ndvi = rng.uniform(-0.2, 0.95, N_CELLS)
+    lst = rng.uniform(15.0, 50.0, N_CELLS)
+    codes = rng.integers(0, len(LANDCOVER_CLASSES), N_CELLS).astype(np.uint8)
+
+    breaks = [b + d for b in NDVI_FUEL_BREAKS for d in (-1e-12, 0.0, 1e-12)]
+    breaks += [np.nextafter(b, -np.inf) for b in NDVI_FUEL_BREAKS]
+    ndvi[: len(breaks)] = breaks
+    slope[50:60], ndvi[60:70], lst[70:80] = np.nan, np.nan, np.nan
+    return slope, ndvi, lst, codes
+
+
+@pytest.mark.parametrize("wind", [0.0, 1.0, 4.5, 12.5, 30.0])
+def test_grid_ros_matches_scalar(cells, wind):
+    slope, ndvi, lst, codes = cells
+    grid = calculate_ros_grid(slope, ndvi, lst, wind, codes)
+    ref = np.array(
+        [
+            calculate_ros(s, v, t, wind, lc)
+            for s, v, t, lc in zip(slope, ndvi, lst, landcover_names(codes))
+        ]
+    )
+
+    # ต่างกันได้แค่ปัดเศษ ; เซลล์ที่อยู่ชิด ROS_CUTOFF_MPS ยอมให้ข้าม cutoff ต่างกันได้
+    near_cutoff = np.isclose(np.maximum(grid, ref), ROS_CUTOFF_MPS, rtol=1e-6, atol=0.0)
+    bad = ~np.isclose(grid, ref, rtol=1e-9, atol=0.0) & ~near_cutoff
+    assert not bad.any(), f"{int(bad.sum())} cells differ at wind={wind}"
+    assert (ref > 0).any()
+